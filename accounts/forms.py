@@ -8,7 +8,7 @@ class CustomUserCreationForm(UserCreationForm):
     """Extended user registration form"""
     email = forms.EmailField(required=True)
     favorite_team = forms.ModelChoiceField(
-        queryset=Team.objects.all(),
+        queryset=Team.objects.only('id', 'name', 'city'),
         required=False,
         label="Favorite Team (optional)"
     )
@@ -14,6 +14,7 @@ class TeamAdmin(admin.ModelAdmin):
 class PlayerAdmin(admin.ModelAdmin):
     list_display = ['name', 'team', 'position', 'jersey_number', 'avg_points', 'avg_rebounds', 'avg_assists']
     list_filter = ['team', 'position']
+    list_select_related = ['team']
     search_fields = ['name', 'team__name']
     ordering = ['team', 'name']
 
@@ -22,6 +23,7 @@ class PlayerAdmin(admin.ModelAdmin):
 class GameAdmin(admin.ModelAdmin):
     list_display = ['date', 'away_team', 'home_team', 'home_score', 'away_score', 'status', 'prediction_home_win_prob', 'is_featured']
     list_filter = ['status', 'date', 'is_featured']
+    list_select_related = ['home_team', 'away_team']
     search_fields = ['home_team__name', 'away_team__name']
     date_hierarchy = 'date'
     ordering = ['-date']
@@ -31,6 +33,7 @@ class GameAdmin(admin.ModelAdmin):
 class UserPickAdmin(admin.ModelAdmin):
     list_display = ['user', 'game', 'picked_team', 'is_correct', 'created_at']
     list_filter = ['created_at', 'picked_team']
+    list_select_related = ['user', 'picked_team', 'game__home_team', 'game__away_team']
     search_fields = ['user__username', 'game__home_team__name', 'game__away_team__name']
 
 
@@ -38,4 +41,5 @@ class UserPickAdmin(admin.ModelAdmin):
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'favorite_team', 'total_picks', 'correct_picks', 'accuracy']
     list_filter = ['favorite_team']
+    list_select_related = ['user', 'favorite_team']
     search_fields = ['user__username']
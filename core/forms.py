@@ -12,9 +12,10 @@ class UserPickForm(forms.Form):
 
     def __init__(self, game, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Only the columns used for choice labels
         self.fields['picked_team'].queryset = Team.objects.filter(
-            pk__in=[game.home_team.pk, game.away_team.pk]
-        )
+            pk__in=[game.home_team_id, game.away_team_id]
+        ).only('id', 'name', 'city')
 
 
 class ExportForm(forms.Form):
@@ -4,8 +4,8 @@ This recalculates total_picks and correct_picks for all users based on their Use
 Also marks all picks for completed games as evaluated.
 """
 from django.core.management.base import BaseCommand
-from django.contrib.auth.models import User
-from core.models import UserPick, UserProfile
+from django.db.models import Count
+from core.models import CORRECT_PICK, UserPick, UserProfile
 
 
 class Command(BaseCommand):
@@ -14,38 +14,45 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         self.stdout.write("Backfilling user pick statistics...")
 
-        # Get all users with picks
-        users_with_picks = User.objects.filter(picks__isnull=False).distinct()
-
-        updated_count = 0
-        for user in users_with_picks:
-            # Get or create profile
-            profile, _ = UserProfile.objects.get_or_create(user=user)
-
-            # Count total picks
-            total = UserPick.objects.filter(user=user).count()
-
-            # Count correct picks (only for completed games)
-            correct = 0
-            picks = UserPick.objects.filter(user=user).select_related('game', 'picked_team')
-            for pick in picks:
-                if pick.game.status == 'final':
-                    # Mark as evaluated since game is complete
-                    if not pick.evaluated:
-                        pick.evaluated = True
-                        pick.save()
-                    # Check if correct
-                    if pick.game.winner == pick.picked_team:
-                        correct += 1
-
-            # Update profile
-            profile.total_picks = total
-            profile.correct_picks = correct
-            profile.save()
-
-            self.stdout.write(f"  {user.username}: {total} picks, {correct} correct")
-            updated_count += 1
+        # Mark picks for completed games as evaluated in a single UPDATE
+        UserPick.objects.filter(game__status='final', evaluated=False).update(evaluated=True)
+
+        # Count total and correct picks per user, grouping UserPick by user
+        # so only users with picks are touched
+        pick_counts = list(
+            UserPick.objects.values('user_id', 'user__username').annotate(
+                total=Count('id'),
+                correct=Count('id', filter=CORRECT_PICK),
+            ).order_by('user_id')
+        )
+        user_ids = [row['user_id'] for row in pick_counts]
+
+        # Create any missing profiles, then load them all in one query
+        UserProfile.objects.bulk_create(
+            [UserProfile(user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+        profiles = {
+            p.user_id: p
+            for p in UserProfile.objects.filter(user_id__in=user_ids)
+        }
+
+        # Only write profiles whose stats are out of date
+        changed = []
+        for row in pick_counts:
+            profile = profiles[row['user_id']]
+            if profile.total_picks == row['total'] and profile.correct_picks == row['correct']:
+                continue
+            profile.total_picks = row['total']
+            profile.correct_picks = row['correct']
+            changed.append(profile)
+            self.stdout.write(f"  {row['user__username']}: {row['total']} picks, {row['correct']} correct")
+
+        UserProfile.objects.bulk_update(
+            changed, ['total_picks', 'correct_picks'], batch_size=1000
+        )
 
         self.stdout.write(self.style.SUCCESS(
-            f"Successfully updated {updated_count} user profiles"
+            f"Successfully updated {len(changed)} user profiles "
+            f"({len(pick_counts) - len(changed)} already up to date)"
         ))
@@ -6,13 +6,16 @@ Get your free API key at: https://the-odds-api.com/
 Set ODDS_API_KEY environment variable or pass --api-key argument.
 """
 import requests
-from datetime import datetime, timedelta
+from datetime import date, timedelta
 from decimal import Decimal
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from django.utils import timezone
 from core.models import Game, Team
+from core.services.http import create_session
 
+# Game fields filled from the odds feed
+LINE_FIELDS = ['vegas_spread', 'vegas_total', 'vegas_home_ml', 'vegas_away_ml']
 
 class Command(BaseCommand):
     help = 'Fetch betting lines from The Odds API'
@@ -91,11 +94,12 @@ class Command(BaseCommand):
         }
 
         try:
-            response = requests.get(
-                f"{self.BASE_URL}/sports/{self.SPORT}/odds",
-                params=params,
-                timeout=30
-            )
+            with create_session() as session:
+                response = session.get(
+                    f"{self.BASE_URL}/sports/{self.SPORT}/odds",
+                    params=params,
+                    timeout=30
+                )
             response.raise_for_status()
             data = response.json()
         except requests.RequestException as e:
@@ -110,7 +114,13 @@ class Command(BaseCommand):
             self.stdout.write("No games found")
             return
 
-        updated = 0
+        # Resolve team ids once so game lookups filter on the FK columns directly
+        team_ids = dict(Team.objects.values_list('abbreviation', 'id'))
+
+        # Games to write, keyed by pk so an event matching the same game as an
+        # earlier one builds on its values (the last event wins, as with save())
+        updated_games = {}
+        labels = {}
         for event in data:
             try:
                 home_team_name = event.get('home_team')
@@ -126,22 +136,25 @@ class Command(BaseCommand):
                 # Parse game date
                 commence_time = event.get('commence_time')
                 if commence_time:
-                    game_date = datetime.fromisoformat(commence_time.replace('Z', '+00:00')).date()
+                    # ISO-8601 UTC timestamp - the date is the first 10 characters
+                    game_date = date.fromisoformat(commence_time[:10])
                 else:
                     continue
 
                 # Find matching game in our database
+                home_team_id = team_ids.get(home_abbr)
+                away_team_id = team_ids.get(away_abbr)
                 game = Game.objects.filter(
-                    home_team__abbreviation=home_abbr,
-                    away_team__abbreviation=away_abbr,
+                    home_team_id=home_team_id,
+                    away_team_id=away_team_id,
                     date=game_date
                 ).first()
 
                 if not game:
                     # Try date +/- 1 day due to timezone differences
                     game = Game.objects.filter(
-                        home_team__abbreviation=home_abbr,
-                        away_team__abbreviation=away_abbr,
+                        home_team_id=home_team_id,
+                        away_team_id=away_team_id,
                         date__gte=game_date - timedelta(days=1),
                         date__lte=game_date + timedelta(days=1)
                     ).first()
@@ -149,6 +162,7 @@ class Command(BaseCommand):
                 if not game:
                     self.stdout.write(f"  Game not found: {away_abbr} @ {home_abbr} on {game_date}")
                     continue
+                game = updated_games.get(game.pk, game)
 
                 # Extract odds from bookmaker
                 bookmakers = event.get('bookmakers', [])
@@ -178,14 +192,39 @@ class Command(BaseCommand):
                         elif outcome['name'] == away_team_name:
                             game.vegas_away_ml = outcome.get('price')
 
-                game.save()
-                updated += 1
-                self.stdout.write(
-                    f"  Updated: {away_abbr} @ {home_abbr} - "
-                    f"Spread: {game.vegas_spread}, Total: {game.vegas_total}"
-                )
+                updated_games[game.pk] = game
+                labels[game.pk] = f"{away_abbr} @ {home_abbr}"
 
             except Exception as e:
                 self.stdout.write(self.style.WARNING(f"  Error processing event: {e}"))
 
-        self.stdout.write(self.style.SUCCESS(f"\nUpdated {updated} games with betting lines"))
+        saved_games = self._save_lines(list(updated_games.values()))
+        for game in saved_games:
+            self.stdout.write(
+                f"  Updated: {labels[game.pk]} - "
+                f"Spread: {game.vegas_spread}, Total: {game.vegas_total}"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"\nUpdated {len(saved_games)} games with betting lines"))
+
+    def _save_lines(self, games):
+        """
+        Write betting lines for games, returning the games that were saved.
+
+        Tries a single bulk_update first; if that fails (e.g. one bad value from
+        the API), saves each game on its own so only the bad ones are skipped.
+        """
+        try:
+            Game.objects.bulk_update(games, LINE_FIELDS, batch_size=500)
+            return games
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"  Bulk write failed ({e}), saving games one at a time"))
+
+        saved = []
+        for game in games:
+            try:
+                game.save(update_fields=LINE_FIELDS)
+                saved.append(game)
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f"  Error saving {game}: {e}"))
+        return saved
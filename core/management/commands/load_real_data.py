@@ -17,14 +17,20 @@ Data Leakage Prevention:
 - Snapshots stored for historical accuracy
 """
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When
 from datetime import timedelta, date
 from decimal import Decimal
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 import time
 
+import numpy as np
+
 from core.models import Team, Player, Game, HeadToHead
-from core.services.nba_api import NBAApiService
-from core.services.prediction_model import predict_game, NBAPredictor
+from core.services.bulk import bulk_sync, bulk_upsert
+from core.services.nba_api import API_TEAM_FIELDS, NBAApiService
+from core.services.prediction_model import predict_games
 
 
 # Key players for each team (2025-26 season rosters)
@@ -60,11 +66,80 @@ KEY_PLAYERS = {
     'UTA': [('Lauri Markkanen', 'PF', 23, 21.5, 8.2, 2.5), ('Collin Sexton', 'SG', 2, 17.2, 2.5, 4.2), ('John Collins', 'PF', 20, 15.5, 8.5, 2.2)],
     'WAS': [('Jordan Poole', 'SG', 13, 18.5, 3.2, 4.8), ('Kyle Kuzma', 'PF', 33, 16.2, 5.5, 2.5), ('Malcolm Brogdon', 'PG', 7, 12.5, 4.2, 5.2)],
 }
+TOTAL_KEY_PLAYERS = sum(map(len, KEY_PLAYERS.values()))
+
+# KEY_PLAYERS with per-game averages converted to Decimal once at import
+KEY_PLAYER_ROWS = {
+    abbrev: [
+        (name, position, jersey, Decimal(str(pts)), Decimal(str(reb)), Decimal(str(ast)))
+        for name, position, jersey, pts, reb, ast in players
+    ]
+    for abbrev, players in KEY_PLAYERS.items()
+}
+
+# Team fields set from a TeamTracker by Command._update_team_from_tracker
+TRACKED_TEAM_FIELDS = [
+    'wins', 'losses', 'elo_rating', 'current_streak', 'home_streak', 'away_streak',
+    'last_10_wins', 'last_10_losses', 'last_game_date',
+    'record_vs_above_500_wins', 'record_vs_above_500_losses',
+    'record_vs_below_500_wins', 'record_vs_below_500_losses',
+    'strength_of_schedule', 'avg_opponent_elo', 'points_trend', 'defense_trend',
+    'avg_points_scored', 'avg_points_allowed', 'offensive_rating', 'defensive_rating',
+    'efg_pct', 'tov_pct', 'orb_pct', 'ft_rate',
+    'opp_efg_pct', 'opp_tov_pct', 'opp_orb_pct', 'opp_ft_rate', 'pace',
+]
+
+# Player fields refreshed from KEY_PLAYERS
+PLAYER_FIELDS = ['position', 'jersey_number', 'avg_points', 'avg_rebounds', 'avg_assists']
+
+# Quantizers for rounding floats into DecimalFields
+TENTHS = Decimal('0.1')
+HUNDREDTHS = Decimal('0.01')
+THOUSANDTHS = Decimal('0.001')
+
+# Window before a game that counts toward 3-in-4 nights
+THREE_DAYS = timedelta(days=3)
+
+# Minimum seconds between game page requests, to respect the API rate limit
+PAGE_INTERVAL = 0.3
+
+# Elo system parameters
+ELO_K_FACTOR = 20
+ELO_HOME_ADVANTAGE = 100
+
+# Game fields written for completed games; any others keep their saved values
+COMPLETED_GAME_FIELDS = [
+    'home_score', 'away_score', 'status',
+    'home_rest_days', 'away_rest_days', 'home_b2b', 'away_b2b', 'home_3in4', 'away_3in4',
+    'home_elo_pre', 'away_elo_pre', 'home_streak_pre', 'away_streak_pre',
+    'h2h_home_wins', 'h2h_away_wins',
+]
+
+# Game fields written for scheduled games, including their predictions
+SCHEDULED_GAME_FIELDS = [
+    'status',
+    'home_rest_days', 'away_rest_days', 'home_b2b', 'away_b2b', 'home_3in4', 'away_3in4',
+    'home_elo_pre', 'away_elo_pre', 'home_streak_pre', 'away_streak_pre',
+    'h2h_home_wins', 'h2h_away_wins',
+    'prediction_home_win_prob', 'prediction_confidence', 'predicted_spread',
+    'predicted_home_score', 'predicted_away_score',
+]
 
 
 class TeamTracker:
     """Track team statistics as games are processed chronologically."""
 
+    # Fixed attribute layout: no per-instance __dict__, faster attribute access
+    __slots__ = (
+        'wins', 'losses', 'points_scored', 'points_allowed',
+        'home_wins', 'home_losses', 'away_wins', 'away_losses',
+        'current_streak', 'home_streak', 'away_streak',
+        'last_10_results', 'last_game_date', 'game_dates',
+        'opponents', 'opponent_elos', 'recent_scores', 'recent_allowed',
+        'vs_above_500_wins', 'vs_above_500_losses', 'vs_below_500_wins', 'vs_below_500_losses',
+        'elo',
+    )
+
     def __init__(self):
         self.wins = 0
         self.losses = 0
@@ -77,13 +152,13 @@ class TeamTracker:
         self.current_streak = 0  # Positive = wins, negative = losses
         self.home_streak = 0
         self.away_streak = 0
-        self.last_10_results = []
+        self.last_10_results = deque(maxlen=10)
         self.last_game_date = None
-        self.game_dates = []  # For B2B/3in4 calculation
+        self.game_dates = deque(maxlen=7)  # For B2B/3in4 calculation
         self.opponents = []  # For SOS calculation
         self.opponent_elos = []
-        self.recent_scores = []  # For trend calculation
-        self.recent_allowed = []
+        self.recent_scores = deque(maxlen=10)  # For trend calculation
+        self.recent_allowed = deque(maxlen=10)
         self.vs_above_500_wins = 0
         self.vs_above_500_losses = 0
         self.vs_below_500_wins = 0
@@ -107,12 +182,17 @@ class TeamTracker:
         return (game_date - self.last_game_date).days == 1
 
     def is_3in4(self, game_date):
-        """Check if this is 3rd game in 4 nights."""
-        if len(self.game_dates) < 2:
-            return False
-        four_days_ago = game_date - timedelta(days=3)
-        recent_games = [d for d in self.game_dates if d >= four_days_ago]
-        return len(recent_games) >= 2
+        """
+        Check if this is 3rd game in 4 nights.
+
+        Games are checked in date order, so dates that fall out of the
+        window are dropped for good and the rest are all recent.
+        """
+        cutoff = game_date - THREE_DAYS
+        game_dates = self.game_dates
+        while game_dates and game_dates[0] < cutoff:
+            game_dates.popleft()
+        return len(game_dates) >= 2
 
     def rest_days(self, game_date):
         """Days since last game."""
@@ -140,43 +220,24 @@ class TeamTracker:
         self.points_scored += points_for
         self.points_allowed += points_against
 
-        # Streak tracking
-        if won:
-            if self.current_streak > 0:
-                self.current_streak += 1
-            else:
-                self.current_streak = 1
-            if is_home:
-                self.home_streak = self.home_streak + 1 if self.home_streak > 0 else 1
-            else:
-                self.away_streak = self.away_streak + 1 if self.away_streak > 0 else 1
+        # Streak tracking: extend a streak with the same sign, otherwise restart it
+        step = 1 if won else -1
+        self.current_streak = self.current_streak + step if self.current_streak * step > 0 else step
+        if is_home:
+            self.home_streak = self.home_streak + step if self.home_streak * step > 0 else step
         else:
-            if self.current_streak < 0:
-                self.current_streak -= 1
-            else:
-                self.current_streak = -1
-            if is_home:
-                self.home_streak = self.home_streak - 1 if self.home_streak < 0 else -1
-            else:
-                self.away_streak = self.away_streak - 1 if self.away_streak < 0 else -1
+            self.away_streak = self.away_streak + step if self.away_streak * step > 0 else step
 
-        # Last 10
+        # Last 10 (the deques drop their oldest entry once full)
         self.last_10_results.append(1 if won else 0)
-        if len(self.last_10_results) > 10:
-            self.last_10_results.pop(0)
 
         # Recent scores for trend
         self.recent_scores.append(points_for)
         self.recent_allowed.append(points_against)
-        if len(self.recent_scores) > 10:
-            self.recent_scores.pop(0)
-            self.recent_allowed.pop(0)
 
         # Game dates
         self.last_game_date = game_date
         self.game_dates.append(game_date)
-        if len(self.game_dates) > 7:
-            self.game_dates.pop(0)
 
         # SOS tracking
         self.opponents.append(opponent_win_pct)
@@ -206,23 +267,42 @@ class TeamTracker:
             return 1500.0
         return sum(self.opponent_elos) / len(self.opponent_elos)
 
-    @property
-    def points_trend(self):
-        """Calculate scoring trend (positive = improving)."""
-        if len(self.recent_scores) < 5:
-            return 0.0
-        first_half = self.recent_scores[:len(self.recent_scores)//2]
-        second_half = self.recent_scores[len(self.recent_scores)//2:]
-        return (sum(second_half) / len(second_half)) - (sum(first_half) / len(first_half))
 
-    @property
-    def defense_trend(self):
-        """Calculate defensive trend (negative = improving defense)."""
-        if len(self.recent_allowed) < 5:
-            return 0.0
-        first_half = self.recent_allowed[:len(self.recent_allowed)//2]
-        second_half = self.recent_allowed[len(self.recent_allowed)//2:]
-        return (sum(second_half) / len(second_half)) - (sum(first_half) / len(first_half))
+def elo_change(winner_elo, loser_elo, margin):
+    """
+    Elo points the winner gains (and the loser drops) for one game.
+
+    Ratings passed in already include any home-court bonus. Pure float math
+    with no Python objects, so it can be JIT-compiled or vectorized as is.
+    """
+    expected = 1 / (1 + 10 ** ((loser_elo - winner_elo) / 400))
+    mov_mult = min(2.5, max(1.0, (margin + 3) ** 0.8 / 20))
+    return ELO_K_FACTOR * mov_mult * (1 - expected)
+
+
+def window_trends(windows, size=10):
+    """
+    Calculate the trend of several rolling windows at once.
+
+    Each trend is the mean of the newer half of a window minus the mean of
+    the older half (positive = rising), or 0.0 for fewer than 5 games.
+    Windows are padded into one (n, size) array so every team is handled
+    in a single NumPy pass.
+    """
+    counts = np.array([len(w) for w in windows])
+    values = np.zeros((len(windows), size))
+    for i, w in enumerate(windows):
+        values[i, :len(w)] = w
+
+    # Older half is [0, count // 2), newer half is [count // 2, count)
+    positions = np.arange(size)
+    halves = (counts // 2)[:, None]
+    older = positions < halves
+    newer = (positions >= halves) & (positions < counts[:, None])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        trends = (values * newer).sum(axis=1) / newer.sum(axis=1) - (values * older).sum(axis=1) / older.sum(axis=1)
+    return np.where(counts >= 5, trends, 0.0)
 
 
 class Command(BaseCommand):
@@ -238,43 +318,49 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.NOTICE('Loading comprehensive 2025-26 NBA data...'))
 
-        # Step 1: Load teams
-        self.stdout.write('Step 1: Syncing NBA teams...')
-        self.load_teams(api_key)
+        # The team list is a single independent request, so fetch it in the
+        # background while paging through the season's games
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            api_teams = executor.submit(NBAApiService(api_key).get_teams)
 
-        # Step 2: Fetch all games from API
-        self.stdout.write('Step 2: Fetching season games from API...')
-        all_games = self.fetch_all_games(api_key, days_ahead)
+            # Step 1: Fetch all games from API
+            self.stdout.write('Step 1: Fetching season games from API...')
+            all_games = self.fetch_all_games(api_key, days_ahead)
 
-        # Step 3: Process games chronologically to build features
-        self.stdout.write('Step 3: Processing games chronologically (avoiding data leakage)...')
-        self.process_games_chronologically(all_games)
+            # Step 2: Load teams
+            self.stdout.write('Step 2: Syncing NBA teams...')
+            self.load_teams(api_teams.result())
 
-        # Step 4: Load players
-        self.stdout.write('Step 4: Loading key players...')
-        self.load_players()
+        # Steps 3-5 only write to the database, so commit them together; the
+        # API fetches above stay outside to avoid holding a transaction open
+        with transaction.atomic():
+            # Step 3: Process games chronologically to build features
+            self.stdout.write('Step 3: Processing games chronologically (avoiding data leakage)...')
+            self.process_games_chronologically(all_games)
 
-        # Step 5: Set featured game
-        self.stdout.write('Step 5: Setting featured game...')
-        self.set_featured_game()
+            # Step 4: Load players
+            self.stdout.write('Step 4: Loading key players...')
+            self.load_players()
+
+            # Step 5: Set featured game
+            self.stdout.write('Step 5: Setting featured game...')
+            self.set_featured_game()
 
         self.stdout.write(self.style.SUCCESS('Data loaded successfully!'))
         self.print_summary()
 
-    def load_teams(self, api_key):
-        service = NBAApiService(api_key)
-        api_teams = service.get_teams()
+    def load_teams(self, api_teams):
         conference_map = {'East': 'EAST', 'West': 'WEST'}
 
-        for api_team in api_teams:
-            Team.objects.update_or_create(
-                abbreviation=api_team.get('abbreviation'),
-                defaults={
-                    'name': api_team.get('name'),
-                    'city': api_team.get('city'),
-                    'conference': conference_map.get(api_team.get('conference'), 'EAST'),
-                }
-            )
+        bulk_sync(Team, Team.objects.in_bulk(field_name='abbreviation'), (
+            (api_team.get('abbreviation'), {
+                'abbreviation': api_team.get('abbreviation'),
+                'name': api_team.get('name'),
+                'city': api_team.get('city'),
+                'conference': conference_map.get(api_team.get('conference'), 'EAST'),
+            })
+            for api_team in api_teams
+        ), API_TEAM_FIELDS)
         self.stdout.write(f'  Synced {len(api_teams)} teams')
 
     def fetch_all_games(self, api_key, days_ahead):
@@ -288,63 +374,73 @@ class Command(BaseCommand):
         self.stdout.write(f'  Fetching {season_start} to {end_date}...')
 
         while True:
+            requested_at = time.monotonic()
             games, cursor = service.get_games(season_start, end_date, cursor=cursor)
             all_games.extend(games)
             if not cursor:
                 break
-            time.sleep(0.3)
+            # Pages chain on the cursor, so they cannot be requested in parallel;
+            # only wait out whatever the request itself did not already take
+            time.sleep(max(0.0, PAGE_INTERVAL - (time.monotonic() - requested_at)))
 
         self.stdout.write(f'  Found {len(all_games)} games')
         return all_games
 
     def process_games_chronologically(self, all_games):
         """Process games in date order to calculate features without data leakage."""
-        # Initialize trackers for each team
-        trackers = {}
-        for team in Team.objects.all():
-            trackers[team.abbreviation] = TeamTracker()
+        # Load every team once and initialize trackers for each
+        teams_by_abbrev = Team.objects.in_bulk(field_name='abbreviation')
+        trackers = {abbrev: TeamTracker() for abbrev in teams_by_abbrev}
 
-        # H2H tracking
-        h2h_records = defaultdict(lambda: {'home_wins': 0, 'away_wins': 0})
+        # H2H tracking: wins by each team, keyed by the unordered matchup
+        h2h_records = defaultdict(lambda: defaultdict(int))
 
-        # Sort games by date
-        sorted_games = sorted(all_games, key=lambda x: x['date'])
-        completed = [g for g in sorted_games if g.get('status') == 'Final']
-        scheduled = [g for g in sorted_games if g.get('status') != 'Final']
+        # Parse every date once, then sort (date, game) pairs with one argsort
+        dates = np.array([g['date'][:10] for g in all_games], dtype='datetime64[D]')
+        game_dates = dates.astype(object)  # datetime.date values
+        sorted_games = [(game_dates[i], all_games[i]) for i in np.argsort(dates, kind='stable')]
+        completed = [(d, g) for d, g in sorted_games if g.get('status') == 'Final']
+        scheduled = [(d, g) for d, g in sorted_games if g.get('status') != 'Final']
 
         self.stdout.write(f'  Processing {len(completed)} completed games...')
 
         # Process completed games first
-        for api_game in completed:
+        completed_games = {}
+        for game_date, api_game in completed:
             home_abbrev = api_game['home_team']['abbreviation']
             away_abbrev = api_game['visitor_team']['abbreviation']
-            game_date = date.fromisoformat(api_game['date'][:10])
             home_score = api_game.get('home_team_score', 0)
             away_score = api_game.get('visitor_team_score', 0)
 
             if home_abbrev not in trackers or away_abbrev not in trackers:
                 continue
 
+            home_team = teams_by_abbrev[home_abbrev]
+            away_team = teams_by_abbrev[away_abbrev]
             home_tracker = trackers[home_abbrev]
             away_tracker = trackers[away_abbrev]
 
-            # Save pre-game state for prediction
-            pre_game_state = {
-                'home_elo': home_tracker.elo,
-                'away_elo': away_tracker.elo,
-                'home_streak': home_tracker.current_streak,
-                'away_streak': away_tracker.current_streak,
-                'home_rest': home_tracker.rest_days(game_date),
-                'away_rest': away_tracker.rest_days(game_date),
-                'home_b2b': home_tracker.is_b2b(game_date),
-                'away_b2b': away_tracker.is_b2b(game_date),
-                'home_3in4': home_tracker.is_3in4(game_date),
-                'away_3in4': away_tracker.is_3in4(game_date),
-            }
-
-            # H2H key (alphabetical order)
-            h2h_key = tuple(sorted([home_abbrev, away_abbrev]))
-            h2h = h2h_records[h2h_key]
+            # Queue game with pre-game features, captured straight onto the
+            # row before this game's result is applied (a repeated matchup
+            # keeps the latest)
+            game = completed_games[(game_date, home_abbrev, away_abbrev)] = Game(
+                date=game_date,
+                home_team=home_team,
+                away_team=away_team,
+                home_score=home_score,
+                away_score=away_score,
+                status='final',
+                home_rest_days=home_tracker.rest_days(game_date),
+                away_rest_days=away_tracker.rest_days(game_date),
+                home_b2b=home_tracker.is_b2b(game_date),
+                away_b2b=away_tracker.is_b2b(game_date),
+                home_3in4=home_tracker.is_3in4(game_date),
+                away_3in4=away_tracker.is_3in4(game_date),
+                home_elo_pre=Decimal(home_tracker.elo).quantize(TENTHS),
+                away_elo_pre=Decimal(away_tracker.elo).quantize(TENTHS),
+                home_streak_pre=home_tracker.current_streak,
+                away_streak_pre=away_tracker.current_streak,
+            )
 
             # Determine winner
             home_won = home_score > away_score
@@ -360,230 +456,205 @@ class Command(BaseCommand):
             )
 
             # Update Elo
-            margin = abs(home_score - away_score)
-            predictor = NBAPredictor()
-            if home_won:
-                elo_change = self._update_elo(home_tracker, away_tracker, True, margin)
-            else:
-                elo_change = self._update_elo(away_tracker, home_tracker, False, margin)
-
-            # Update H2H
-            if home_won:
-                if home_abbrev == h2h_key[0]:
-                    h2h['home_wins'] += 1
-                else:
-                    h2h['away_wins'] += 1
-            else:
-                if away_abbrev == h2h_key[0]:
-                    h2h['home_wins'] += 1
-                else:
-                    h2h['away_wins'] += 1
-
-            # Save game to database with pre-game features
-            try:
-                home_team = Team.objects.get(abbreviation=home_abbrev)
-                away_team = Team.objects.get(abbreviation=away_abbrev)
-
-                Game.objects.update_or_create(
-                    date=game_date,
-                    home_team=home_team,
-                    away_team=away_team,
-                    defaults={
-                        'home_score': home_score,
-                        'away_score': away_score,
-                        'status': 'final',
-                        'home_rest_days': pre_game_state['home_rest'],
-                        'away_rest_days': pre_game_state['away_rest'],
-                        'home_b2b': pre_game_state['home_b2b'],
-                        'away_b2b': pre_game_state['away_b2b'],
-                        'home_3in4': pre_game_state['home_3in4'],
-                        'away_3in4': pre_game_state['away_3in4'],
-                        'home_elo_pre': Decimal(str(round(pre_game_state['home_elo'], 1))),
-                        'away_elo_pre': Decimal(str(round(pre_game_state['away_elo'], 1))),
-                        'home_streak_pre': pre_game_state['home_streak'],
-                        'away_streak_pre': pre_game_state['away_streak'],
-                        'h2h_home_wins': h2h['home_wins'] if home_abbrev == h2h_key[0] else h2h['away_wins'],
-                        'h2h_away_wins': h2h['away_wins'] if home_abbrev == h2h_key[0] else h2h['home_wins'],
-                    }
-                )
-            except Team.DoesNotExist:
-                continue
+            self._update_elo(home_tracker, away_tracker, home_won, abs(home_score - away_score))
+
+            # Update H2H; the stored record includes this game
+            h2h = h2h_records[frozenset((home_abbrev, away_abbrev))]
+            h2h[home_abbrev if home_won else away_abbrev] += 1
+            game.h2h_home_wins = h2h[home_abbrev]
+            game.h2h_away_wins = h2h[away_abbrev]
 
-        # Update team models with final stats
+        # Update team models with final stats (saved below)
         self.stdout.write('  Updating team statistics...')
-        for abbrev, tracker in trackers.items():
-            try:
-                team = Team.objects.get(abbreviation=abbrev)
-                self._update_team_from_tracker(team, tracker)
-            except Team.DoesNotExist:
-                continue
+        abbrevs = list(trackers)
+        points_trends = window_trends([trackers[a].recent_scores for a in abbrevs])
+        defense_trends = window_trends([trackers[a].recent_allowed for a in abbrevs])
+        for abbrev, points_trend, defense_trend in zip(abbrevs, points_trends.tolist(), defense_trends.tolist()):
+            self._update_team_from_tracker(teams_by_abbrev[abbrev], trackers[abbrev], points_trend, defense_trend)
 
         # Process scheduled games with predictions
         self.stdout.write(f'  Processing {len(scheduled)} scheduled games with predictions...')
-        for api_game in scheduled:
+        scheduled_games = {}
+        to_predict = []
+        for game_date, api_game in scheduled:
             home_abbrev = api_game['home_team']['abbreviation']
             away_abbrev = api_game['visitor_team']['abbreviation']
-            game_date = date.fromisoformat(api_game['date'][:10])
-
-            try:
-                home_team = Team.objects.get(abbreviation=home_abbrev)
-                away_team = Team.objects.get(abbreviation=away_abbrev)
-                home_tracker = trackers.get(home_abbrev)
-                away_tracker = trackers.get(away_abbrev)
-
-                if not home_tracker or not away_tracker:
-                    continue
-
-                # Calculate schedule features
-                h2h_key = tuple(sorted([home_abbrev, away_abbrev]))
-                h2h = h2h_records[h2h_key]
-
-                # Create game with schedule features
-                game, _ = Game.objects.update_or_create(
-                    date=game_date,
-                    home_team=home_team,
-                    away_team=away_team,
-                    defaults={
-                        'status': 'scheduled',
-                        'home_rest_days': home_tracker.rest_days(game_date),
-                        'away_rest_days': away_tracker.rest_days(game_date),
-                        'home_b2b': home_tracker.is_b2b(game_date),
-                        'away_b2b': away_tracker.is_b2b(game_date),
-                        'home_3in4': home_tracker.is_3in4(game_date),
-                        'away_3in4': away_tracker.is_3in4(game_date),
-                        'home_elo_pre': team.elo_rating,
-                        'away_elo_pre': away_team.elo_rating,
-                        'home_streak_pre': home_tracker.current_streak,
-                        'away_streak_pre': away_tracker.current_streak,
-                        'h2h_home_wins': h2h['home_wins'] if home_abbrev == h2h_key[0] else h2h['away_wins'],
-                        'h2h_away_wins': h2h['away_wins'] if home_abbrev == h2h_key[0] else h2h['home_wins'],
-                    }
-                )
-
-                # Generate prediction
-                home_prob, confidence, spread, home_score, away_score = predict_game(home_team, away_team, game_date, game)
-                game.prediction_home_win_prob = home_prob
-                game.prediction_confidence = confidence
-                game.predicted_spread = spread
-                game.predicted_home_score = home_score
-                game.predicted_away_score = away_score
-                game.save()
-
-            except Team.DoesNotExist:
+
+            if home_abbrev not in trackers or away_abbrev not in trackers:
                 continue
 
-    def _update_elo(self, winner_tracker, loser_tracker, winner_is_home, margin):
-        """Update Elo ratings after a game."""
-        K = 20
-        home_advantage = 100
+            home_team = teams_by_abbrev[home_abbrev]
+            away_team = teams_by_abbrev[away_abbrev]
+            home_tracker = trackers[home_abbrev]
+            away_tracker = trackers[away_abbrev]
 
-        if winner_is_home:
-            winner_elo = winner_tracker.elo + home_advantage
-            loser_elo = loser_tracker.elo
-        else:
-            winner_elo = winner_tracker.elo
-            loser_elo = loser_tracker.elo + home_advantage
+            # Calculate schedule features
+            h2h = h2h_records[frozenset((home_abbrev, away_abbrev))]
+
+            # Build game with schedule features
+            game = scheduled_games[(game_date, home_abbrev, away_abbrev)] = Game(
+                date=game_date,
+                home_team=home_team,
+                away_team=away_team,
+                status='scheduled',
+                home_rest_days=home_tracker.rest_days(game_date),
+                away_rest_days=away_tracker.rest_days(game_date),
+                home_b2b=home_tracker.is_b2b(game_date),
+                away_b2b=away_tracker.is_b2b(game_date),
+                home_3in4=home_tracker.is_3in4(game_date),
+                away_3in4=away_tracker.is_3in4(game_date),
+                home_elo_pre=home_team.elo_rating,
+                away_elo_pre=away_team.elo_rating,
+                home_streak_pre=home_tracker.current_streak,
+                away_streak_pre=away_tracker.current_streak,
+                h2h_home_wins=h2h[home_abbrev],
+                h2h_away_wins=h2h[away_abbrev],
+            )
+
+            to_predict.append((home_team, away_team, game_date, game))
+
+        # Generate predictions for every scheduled game in one batch
+        for (_, _, _, game), prediction in zip(to_predict, predict_games(to_predict)):
+            home_prob, confidence, spread, home_score, away_score = prediction
+            game.prediction_home_win_prob = home_prob
+            game.prediction_confidence = confidence
+            game.predicted_spread = spread
+            game.predicted_home_score = home_score
+            game.predicted_away_score = away_score
+
+        # Everything is computed in memory above; write it all together so a
+        # failed run leaves the previous data in place
+        with transaction.atomic(savepoint=False):
+            bulk_upsert(
+                Game, list(completed_games.values()), ['date', 'home_team', 'away_team'],
+                COMPLETED_GAME_FIELDS, batch_size=500,
+            )
+            Team.objects.bulk_update(teams_by_abbrev.values(), TRACKED_TEAM_FIELDS, batch_size=30)
+            bulk_upsert(
+                Game, list(scheduled_games.values()), ['date', 'home_team', 'away_team'],
+                SCHEDULED_GAME_FIELDS, batch_size=500,
+            )
 
-        expected = 1 / (1 + 10 ** ((loser_elo - winner_elo) / 400))
-        mov_mult = min(2.5, max(1.0, (margin + 3) ** 0.8 / 20))
-        elo_change = K * mov_mult * (1 - expected)
+    def _update_elo(self, home_tracker, away_tracker, home_won, margin):
+        """Update Elo ratings after a game."""
+        home_elo = home_tracker.elo + ELO_HOME_ADVANTAGE
+        if home_won:
+            winner_tracker, loser_tracker = home_tracker, away_tracker
+            change = elo_change(home_elo, away_tracker.elo, margin)
+        else:
+            winner_tracker, loser_tracker = away_tracker, home_tracker
+            change = elo_change(away_tracker.elo, home_elo, margin)
 
-        winner_tracker.elo += elo_change
-        loser_tracker.elo -= elo_change
+        winner_tracker.elo += change
+        loser_tracker.elo -= change
 
-        return elo_change
+        return change
 
-    def _update_team_from_tracker(self, team, tracker):
-        """Update Team model from tracker data."""
+    def _update_team_from_tracker(self, team, tracker, points_trend, defense_trend):
+        """Update Team model (unsaved) from tracker data and its precomputed trends."""
         team.wins = tracker.wins
         team.losses = tracker.losses
-        team.elo_rating = Decimal(str(round(tracker.elo, 1)))
+        team.elo_rating = Decimal(tracker.elo).quantize(TENTHS)
         team.current_streak = tracker.current_streak
         team.home_streak = tracker.home_streak
         team.away_streak = tracker.away_streak
         team.last_10_wins = sum(tracker.last_10_results)
-        team.last_10_losses = len(tracker.last_10_results) - sum(tracker.last_10_results)
+        team.last_10_losses = len(tracker.last_10_results) - team.last_10_wins
         team.last_game_date = tracker.last_game_date
         team.record_vs_above_500_wins = tracker.vs_above_500_wins
         team.record_vs_above_500_losses = tracker.vs_above_500_losses
         team.record_vs_below_500_wins = tracker.vs_below_500_wins
         team.record_vs_below_500_losses = tracker.vs_below_500_losses
-        team.strength_of_schedule = Decimal(str(round(tracker.strength_of_schedule, 3)))
-        team.avg_opponent_elo = Decimal(str(round(tracker.avg_opponent_elo, 1)))
-        team.points_trend = Decimal(str(round(tracker.points_trend, 2)))
-        team.defense_trend = Decimal(str(round(tracker.defense_trend, 2)))
+        team.strength_of_schedule = Decimal(tracker.strength_of_schedule).quantize(THOUSANDTHS)
+        team.avg_opponent_elo = Decimal(tracker.avg_opponent_elo).quantize(TENTHS)
+        team.points_trend = Decimal(points_trend).quantize(HUNDREDTHS)
+        team.defense_trend = Decimal(defense_trend).quantize(HUNDREDTHS)
 
         # Calculate averages
         if tracker.games_played > 0:
             avg_scored = tracker.points_scored / tracker.games_played
             avg_allowed = tracker.points_allowed / tracker.games_played
-            team.avg_points_scored = Decimal(str(round(avg_scored, 1)))
-            team.avg_points_allowed = Decimal(str(round(avg_allowed, 1)))
-            team.offensive_rating = Decimal(str(round(avg_scored, 1)))
-            team.defensive_rating = Decimal(str(round(avg_allowed, 1)))
+            team.avg_points_scored = Decimal(avg_scored).quantize(TENTHS)
+            team.avg_points_allowed = Decimal(avg_allowed).quantize(TENTHS)
+            team.offensive_rating = Decimal(avg_scored).quantize(TENTHS)
+            team.defensive_rating = Decimal(avg_allowed).quantize(TENTHS)
 
             # Estimate Four Factors
             eff = avg_scored / 110
-            team.efg_pct = Decimal(str(round(0.50 + (eff - 1) * 0.08, 3)))
-            team.tov_pct = Decimal(str(round(0.13 - (eff - 1) * 0.02, 3)))
-            team.orb_pct = Decimal(str(round(0.25 + (eff - 1) * 0.03, 3)))
-            team.ft_rate = Decimal(str(round(0.25 + (eff - 1) * 0.02, 3)))
+            team.efg_pct = Decimal(0.50 + (eff - 1) * 0.08).quantize(THOUSANDTHS)
+            team.tov_pct = Decimal(0.13 - (eff - 1) * 0.02).quantize(THOUSANDTHS)
+            team.orb_pct = Decimal(0.25 + (eff - 1) * 0.03).quantize(THOUSANDTHS)
+            team.ft_rate = Decimal(0.25 + (eff - 1) * 0.02).quantize(THOUSANDTHS)
 
             def_eff = 110 / avg_allowed
-            team.opp_efg_pct = Decimal(str(round(0.54 - (def_eff - 1) * 0.08, 3)))
-            team.opp_tov_pct = Decimal(str(round(0.13 + (def_eff - 1) * 0.02, 3)))
-            team.opp_orb_pct = Decimal(str(round(0.25 - (def_eff - 1) * 0.03, 3)))
-            team.opp_ft_rate = Decimal(str(round(0.25 - (def_eff - 1) * 0.02, 3)))
+            team.opp_efg_pct = Decimal(0.54 - (def_eff - 1) * 0.08).quantize(THOUSANDTHS)
+            team.opp_tov_pct = Decimal(0.13 + (def_eff - 1) * 0.02).quantize(THOUSANDTHS)
+            team.opp_orb_pct = Decimal(0.25 - (def_eff - 1) * 0.03).quantize(THOUSANDTHS)
+            team.opp_ft_rate = Decimal(0.25 - (def_eff - 1) * 0.02).quantize(THOUSANDTHS)
 
-            team.pace = Decimal(str(round(98 + (avg_scored + avg_allowed - 220) * 0.5, 1)))
-
-        team.save()
+            team.pace = Decimal(98 + (avg_scored + avg_allowed - 220) * 0.5).quantize(TENTHS)
 
     def load_players(self):
-        created = 0
-        for abbrev, players in KEY_PLAYERS.items():
-            try:
-                team = Team.objects.get(abbreviation=abbrev)
-                for name, position, jersey, pts, reb, ast in players:
-                    _, was_created = Player.objects.update_or_create(
-                        name=name, team=team,
-                        defaults={
-                            'position': position,
-                            'jersey_number': jersey,
-                            'avg_points': Decimal(str(pts)),
-                            'avg_rebounds': Decimal(str(reb)),
-                            'avg_assists': Decimal(str(ast)),
-                        }
-                    )
-                    if was_created:
-                        created += 1
-            except Team.DoesNotExist:
-                continue
-        self.stdout.write(f'  Loaded {sum(len(p) for p in KEY_PLAYERS.values())} players ({created} new)')
+        teams_by_abbrev = Team.objects.in_bulk(list(KEY_PLAYERS), field_name='abbreviation')
+
+        # Player has no unique constraint on (name, team) to upsert against
+        existing = {
+            (player.name, player.team_id): player
+            for player in Player.objects.filter(team__in=teams_by_abbrev.values())
+        }
+        rows = (
+            ((name, team.pk), {
+                'name': name, 'team': team, 'position': position, 'jersey_number': jersey,
+                'avg_points': pts, 'avg_rebounds': reb, 'avg_assists': ast,
+            })
+            for abbrev, team in teams_by_abbrev.items()
+            for name, position, jersey, pts, reb, ast in KEY_PLAYER_ROWS[abbrev]
+        )
+        created, _ = bulk_sync(Player, existing, rows, PLAYER_FIELDS, batch_size=100)
+        self.stdout.write(f'  Loaded {TOTAL_KEY_PLAYERS} players ({len(created)} new)')
 
     def set_featured_game(self):
         today = date.today()
-        Game.objects.filter(is_featured=True).update(is_featured=False)
 
-        todays_games = Game.objects.filter(date=today, status='scheduled')
-        if todays_games.exists():
-            best = max(todays_games, key=lambda g: float(g.home_team.elo_rating) + float(g.away_team.elo_rating))
-            best.is_featured = True
-            best.save()
+        # Pick the matchup with the highest combined Elo in the query itself
+        best = (
+            Game.objects.filter(date=today, status='scheduled')
+            .select_related('home_team', 'away_team')
+            # Only the columns the log line needs
+            .only('date', 'home_team__abbreviation', 'away_team__abbreviation')
+            .annotate(combined_elo=F('home_team__elo_rating') + F('away_team__elo_rating'))
+            .order_by('-combined_elo', 'time')
+            .first()
+        )
+        # Clear old featured games and mark the new one in a single UPDATE
+        best_pk = best.pk if best else None
+        Game.objects.filter(Q(is_featured=True) | Q(pk=best_pk)).update(
+            is_featured=Case(When(pk=best_pk, then=Value(True)), default=Value(False))
+        )
+        if best:
             self.stdout.write(f'  Featured: {best}')
 
     def print_summary(self):
         self.stdout.write('\n' + '='*60)
         self.stdout.write('COMPREHENSIVE DATA SUMMARY')
         self.stdout.write('='*60)
+        # All three game counts in one query
+        game_counts = Game.objects.aggregate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(status='final')),
+            scheduled=Count('id', filter=Q(status='scheduled')),
+        )
         self.stdout.write(f'Teams: {Team.objects.count()}')
         self.stdout.write(f'Players: {Player.objects.count()}')
-        self.stdout.write(f'Games: {Game.objects.count()}')
-        self.stdout.write(f'  - Completed: {Game.objects.filter(status="final").count()}')
-        self.stdout.write(f'  - Scheduled: {Game.objects.filter(status="scheduled").count()}')
+        self.stdout.write(f'Games: {game_counts["total"]}')
+        self.stdout.write(f'  - Completed: {game_counts["completed"]}')
+        self.stdout.write(f'  - Scheduled: {game_counts["scheduled"]}')
 
         self.stdout.write('\nTop 5 Teams by Elo:')
-        for i, t in enumerate(Team.objects.order_by('-elo_rating')[:5], 1):
+        top_teams = Team.objects.order_by('-elo_rating').only(
+            'abbreviation', 'elo_rating', 'wins', 'losses', 'current_streak'
+        )[:5]
+        for i, t in enumerate(top_teams, 1):
             self.stdout.write(f'  {i}. {t.abbreviation}: {t.elo_rating} ({t.record}) Streak: {t.current_streak:+d}')
 
         self.stdout.write('\nFeatures calculated:')
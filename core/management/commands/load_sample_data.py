@@ -2,17 +2,48 @@
 Management command to load sample NBA data.
 """
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
-import random
+import numpy as np
 
 from core.models import Team, Player, Game
+from core.services.bulk import bulk_sync, bulk_upsert
+
+# Fields refreshed on rows that already exist
+SAMPLE_TEAM_FIELDS = ['name', 'city', 'conference', 'wins', 'losses']
+SAMPLE_PLAYER_FIELDS = ['position', 'jersey_number', 'avg_points', 'avg_rebounds', 'avg_assists']
+PREDICTION_FIELDS = ['prediction_home_win_prob', 'prediction_confidence', 'predicted_spread']
+GAME_UNIQUE_FIELDS = ['date', 'home_team', 'away_team']
+
+
+def random_matchups(rng, team_list, n):
+    """Draw n random (home, away) pairs of distinct teams."""
+    num_teams = len(team_list)
+    home_idx = rng.integers(0, num_teams, size=n)
+    # An offset in [1, num_teams) never lands back on the home team
+    away_idx = (home_idx + rng.integers(1, num_teams, size=n)) % num_teams
+    return [(team_list[h], team_list[a]) for h, a in zip(home_idx.tolist(), away_idx.tolist())]
+
+
+def random_predictions(rng, n):
+    """Draw n random (home win prob, confidence, spread) predictions as Decimals."""
+    home_win_probs = rng.uniform(35, 75, size=n).round(2).tolist()
+    confidences = rng.uniform(45, 80, size=n).round(2).tolist()
+    spreads = rng.uniform(-10, 10, size=n).round(1).tolist()
+    return [
+        (Decimal(str(prob)), Decimal(str(conf)), Decimal(str(spread)))
+        for prob, conf, spread in zip(home_win_probs, confidences, spreads)
+    ]
 
 
 class Command(BaseCommand):
     help = 'Loads sample NBA data (teams, players, games)'
 
+    # Load everything in one transaction: a single commit, and a failed run
+    # leaves no half-loaded sample data behind
+    @transaction.atomic
     def handle(self, *args, **options):
         self.stdout.write('Loading sample NBA data...')
 
@@ -52,14 +83,17 @@ class Command(BaseCommand):
             {'name': 'Trail Blazers', 'city': 'Portland', 'abbreviation': 'POR', 'conference': 'WEST', 'wins': 10, 'losses': 24},
         ]
 
+        # Upsert every team in one statement, then load the saved rows
+        abbreviations = [team_data['abbreviation'] for team_data in teams_data]
+        existing = Team.objects.in_bulk(abbreviations, field_name='abbreviation')
+        bulk_upsert(Team, [Team(**team_data) for team_data in teams_data], ['abbreviation'], SAMPLE_TEAM_FIELDS)
+        saved_teams = Team.objects.in_bulk(abbreviations, field_name='abbreviation')
+
         teams = {}
-        for team_data in teams_data:
-            team, created = Team.objects.update_or_create(
-                abbreviation=team_data['abbreviation'],
-                defaults=team_data
-            )
-            teams[team_data['abbreviation']] = team
-            if created:
+        for abbreviation in abbreviations:
+            team = saved_teams[abbreviation]
+            teams[abbreviation] = team
+            if abbreviation not in existing:
                 self.stdout.write(f'  Created team: {team}')
 
         self.stdout.write(self.style.SUCCESS(f'Loaded {len(teams_data)} teams'))
@@ -87,22 +121,26 @@ class Command(BaseCommand):
             {'name': 'Jamal Murray', 'team': 'DEN', 'position': 'PG', 'jersey_number': 27, 'avg_points': 21.3, 'avg_rebounds': 4.1, 'avg_assists': 6.5},
         ]
 
-        player_count = 0
+        # Player has no unique constraint on (name, team) to upsert against
+        existing_players = {
+            (player.name, player.team_id): player
+            for player in Player.objects.filter(team__in=teams.values())
+        }
+        rows = []
         for player_data in players_data:
             team = teams.get(player_data['team'])
             if team:
-                Player.objects.update_or_create(
-                    name=player_data['name'],
-                    team=team,
-                    defaults={
-                        'position': player_data['position'],
-                        'jersey_number': player_data['jersey_number'],
-                        'avg_points': Decimal(str(player_data['avg_points'])),
-                        'avg_rebounds': Decimal(str(player_data['avg_rebounds'])),
-                        'avg_assists': Decimal(str(player_data['avg_assists'])),
-                    }
-                )
-                player_count += 1
+                rows.append(((player_data['name'], team.pk), {
+                    'name': player_data['name'],
+                    'team': team,
+                    'position': player_data['position'],
+                    'jersey_number': player_data['jersey_number'],
+                    'avg_points': Decimal(str(player_data['avg_points'])),
+                    'avg_rebounds': Decimal(str(player_data['avg_rebounds'])),
+                    'avg_assists': Decimal(str(player_data['avg_assists'])),
+                }))
+        player_count = len(rows)
+        bulk_sync(Player, existing_players, rows, SAMPLE_PLAYER_FIELDS)
 
         self.stdout.write(self.style.SUCCESS(f'Loaded {player_count} players'))
 
@@ -110,79 +148,81 @@ class Command(BaseCommand):
         today = timezone.now().date()
         team_list = list(teams.values())
 
-        # Past games (completed)
-        for i in range(10):
-            game_date = today - timedelta(days=i+1)
-            home_team = random.choice(team_list)
-            away_team = random.choice([t for t in team_list if t != home_team])
-
-            home_score = random.randint(95, 130)
-            away_score = random.randint(95, 130)
+        # Games are collected per section, keyed like Game's unique_together so
+        # a repeated random matchup keeps its last values, then upserted in bulk
+        past_games = {}
+        todays_games = {}
+        upcoming_games = {}
 
-            home_win_prob = Decimal(str(round(random.uniform(35, 75), 2)))
-            confidence = Decimal(str(round(random.uniform(45, 80), 2)))
-            spread = Decimal(str(round(random.uniform(-10, 10), 1)))
+        rng = np.random.default_rng()
 
-            Game.objects.update_or_create(
+        # Past games (completed)
+        past_dates = [today - timedelta(days=i+1) for i in range(10)]
+        scores = rng.integers(95, 131, size=(len(past_dates), 2)).tolist()
+        for game_date, (home_team, away_team), (home_score, away_score), prediction in zip(
+            past_dates, random_matchups(rng, team_list, len(past_dates)), scores,
+            random_predictions(rng, len(past_dates)),
+        ):
+            home_win_prob, confidence, spread = prediction
+            past_games[(game_date, home_team.pk, away_team.pk)] = Game(
                 date=game_date,
                 home_team=home_team,
                 away_team=away_team,
-                defaults={
-                    'home_score': home_score,
-                    'away_score': away_score,
-                    'status': 'final',
-                    'prediction_home_win_prob': home_win_prob,
-                    'prediction_confidence': confidence,
-                    'predicted_spread': spread,
-                }
+                home_score=home_score,
+                away_score=away_score,
+                status='final',
+                prediction_home_win_prob=home_win_prob,
+                prediction_confidence=confidence,
+                predicted_spread=spread,
             )
 
         # Today's games
-        for i in range(3):
+        for i, (home_win_prob, confidence, spread) in enumerate(random_predictions(rng, 3)):
             home_team = team_list[i*2]
             away_team = team_list[i*2 + 1]
 
-            home_win_prob = Decimal(str(round(random.uniform(35, 75), 2)))
-            confidence = Decimal(str(round(random.uniform(45, 80), 2)))
-            spread = Decimal(str(round(random.uniform(-10, 10), 1)))
-
-            game, _ = Game.objects.update_or_create(
+            todays_games[(today, home_team.pk, away_team.pk)] = Game(
                 date=today,
                 home_team=home_team,
                 away_team=away_team,
-                defaults={
-                    'status': 'scheduled',
-                    'prediction_home_win_prob': home_win_prob,
-                    'prediction_confidence': confidence,
-                    'predicted_spread': spread,
-                    'is_featured': i == 0,
-                }
+                status='scheduled',
+                prediction_home_win_prob=home_win_prob,
+                prediction_confidence=confidence,
+                predicted_spread=spread,
+                is_featured=i == 0,
+            )
+
+        # Upcoming games: 2-5 per day over the next week
+        games_per_day = rng.integers(2, 6, size=7).tolist()
+        upcoming_dates = [
+            today + timedelta(days=i+1)
+            for i, count in enumerate(games_per_day)
+            for _ in range(count)
+        ]
+        for game_date, (home_team, away_team), (home_win_prob, confidence, spread) in zip(
+            upcoming_dates, random_matchups(rng, team_list, len(upcoming_dates)),
+            random_predictions(rng, len(upcoming_dates)),
+        ):
+            upcoming_games[(game_date, home_team.pk, away_team.pk)] = Game(
+                date=game_date,
+                home_team=home_team,
+                away_team=away_team,
+                status='scheduled',
+                prediction_home_win_prob=home_win_prob,
+                prediction_confidence=confidence,
+                predicted_spread=spread,
             )
 
-        # Upcoming games
-        for i in range(7):
-            game_date = today + timedelta(days=i+1)
-            games_per_day = random.randint(2, 5)
-
-            for j in range(games_per_day):
-                home_team = random.choice(team_list)
-                away_team = random.choice([t for t in team_list if t != home_team])
-
-                home_win_prob = Decimal(str(round(random.uniform(35, 75), 2)))
-                confidence = Decimal(str(round(random.uniform(45, 80), 2)))
-                spread = Decimal(str(round(random.uniform(-10, 10), 1)))
-
-                Game.objects.update_or_create(
-                    date=game_date,
-                    home_team=home_team,
-                    away_team=away_team,
-                    defaults={
-                        'status': 'scheduled',
-                        'prediction_home_win_prob': home_win_prob,
-                        'prediction_confidence': confidence,
-                        'predicted_spread': spread,
-                    }
-                )
+        # Each section refreshes a different set of fields on existing games
+        bulk_upsert(
+            Game, list(past_games.values()), GAME_UNIQUE_FIELDS,
+            ['home_score', 'away_score', 'status'] + PREDICTION_FIELDS,
+        )
+        bulk_upsert(
+            Game, list(todays_games.values()), GAME_UNIQUE_FIELDS,
+            ['status'] + PREDICTION_FIELDS + ['is_featured'],
+        )
+        bulk_upsert(Game, list(upcoming_games.values()), GAME_UNIQUE_FIELDS, ['status'] + PREDICTION_FIELDS)
 
         game_count = Game.objects.count()
         self.stdout.write(self.style.SUCCESS(f'Loaded {game_count} games'))
@@ -2,6 +2,7 @@
 Management command to sync data from NBA API.
 """
 from django.core.management.base import BaseCommand
+from django.db.models import Case, F, Q, Value, When
 from django.utils.timezone import localdate
 from core.services.nba_api import sync_teams_from_api, sync_games_from_api
 
@@ -86,31 +87,25 @@ class Command(BaseCommand):
 
         today = localdate()
 
-        # Clear old featured games
-        Game.objects.filter(is_featured=True).update(is_featured=False)
-
-        # Get today's scheduled games
-        todays_games = Game.objects.filter(
-            date=today,
-            status='scheduled'
-        ).select_related('home_team', 'away_team')
-
-        if not todays_games.exists():
-            return None
-
-        # Find best matchup (highest combined wins = best teams playing)
-        best_game = None
-        best_score = -1
+        # Best matchup = highest combined wins (best teams playing), ranked in
+        # the query; ties go to the earliest tip-off as in Game's ordering
+        # Only the id and the two abbreviations are needed, so skip building models
+        best_game = (
+            Game.objects.filter(date=today, status='scheduled')
+            .annotate(combined_wins=F('home_team__wins') + F('away_team__wins'))
+            .order_by('-combined_wins', 'time')
+            .values_list('pk', 'away_team__abbreviation', 'home_team__abbreviation')
+            .first()
+        )
 
-        for game in todays_games:
-            combined_wins = game.home_team.wins + game.away_team.wins
-            if combined_wins > best_score:
-                best_score = combined_wins
-                best_game = game
+        # Clear old featured games and mark the new one in a single UPDATE
+        best_pk = best_game[0] if best_game else None
+        Game.objects.filter(Q(is_featured=True) | Q(pk=best_pk)).update(
+            is_featured=Case(When(pk=best_pk, then=Value(True)), default=Value(False))
+        )
 
         if best_game:
-            best_game.is_featured = True
-            best_game.save()
-            return f"{best_game.away_team.abbreviation} @ {best_game.home_team.abbreviation}"
+            _, away_abbr, home_abbr = best_game
+            return f"{away_abbr} @ {home_abbr}"
 
         return None
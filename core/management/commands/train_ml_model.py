@@ -9,12 +9,26 @@ from django.conf import settings
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import Ridge
-from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.inspection import permutation_importance
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import joblib
 
 from core.models import HistoricalGame
 
+# zlib level for saved models; joblib.load decompresses transparently and
+# tree ensembles shrink several times over
+MODEL_COMPRESSION = 3
+
+# HistoricalGame columns read by _prepare_data
+DATA_COLUMNS = [
+    'home_win_pct', 'away_win_pct',
+    'home_ppg_l10', 'away_ppg_l10', 'home_papg_l10', 'away_papg_l10',
+    'home_streak', 'away_streak', 'home_rest_days', 'away_rest_days',
+    'home_home_wins', 'home_home_losses', 'away_away_wins', 'away_away_losses',
+    'h2h_home_wins', 'h2h_away_wins',
+    'home_score', 'away_score',
+]
 
 class Command(BaseCommand):
     help = 'Train ML models for NBA game predictions'
@@ -69,15 +83,21 @@ class Command(BaseCommand):
 
         # Cross-validation
         self.stdout.write("\n--- Cross-Validation (5-fold) ---")
-        spread_cv = cross_val_score(spread_model, X_train_scaled, y_spread_train, cv=5, scoring='neg_mean_absolute_error')
-        total_cv = cross_val_score(total_model, X_train_scaled, y_total_train, cv=5, scoring='neg_mean_absolute_error')
+        # Folds are independent fits, so spread them across all CPU cores
+        spread_cv = cross_val_score(spread_model, X_train_scaled, y_spread_train, cv=5, scoring='neg_mean_absolute_error', n_jobs=-1)
+        total_cv = cross_val_score(total_model, X_train_scaled, y_total_train, cv=5, scoring='neg_mean_absolute_error', n_jobs=-1)
         self.stdout.write(f"Spread CV MAE: {-spread_cv.mean():.2f} (+/- {spread_cv.std() * 2:.2f})")
         self.stdout.write(f"Total CV MAE: {-total_cv.mean():.2f} (+/- {total_cv.std() * 2:.2f})")
 
-        # Feature importance (for tree-based models)
+        # Feature importance (for tree-based models). Histogram boosting has no
+        # feature_importances_, so measure the test-set MAE lost per shuffled feature
         if model_type == 'gbr':
             self.stdout.write("\n--- Feature Importance ---")
-            importances = list(zip(feature_names, spread_model.feature_importances_))
+            result = permutation_importance(
+                spread_model, X_test_scaled, y_spread_test,
+                scoring='neg_mean_absolute_error', n_repeats=5, random_state=42,
+            )
+            importances = list(zip(feature_names, result.importances_mean))
             importances.sort(key=lambda x: x[1], reverse=True)
             for name, imp in importances[:10]:
                 self.stdout.write(f"  {name}: {imp:.3f}")
@@ -86,10 +106,10 @@ class Command(BaseCommand):
         model_dir = settings.BASE_DIR / 'core' / 'ml_models'
         model_dir.mkdir(exist_ok=True)
 
-        joblib.dump(spread_model, model_dir / 'spread_model.joblib')
-        joblib.dump(total_model, model_dir / 'total_model.joblib')
-        joblib.dump(scaler, model_dir / 'scaler.joblib')
-        joblib.dump(feature_names, model_dir / 'feature_names.joblib')
+        joblib.dump(spread_model, model_dir / 'spread_model.joblib', compress=MODEL_COMPRESSION)
+        joblib.dump(total_model, model_dir / 'total_model.joblib', compress=MODEL_COMPRESSION)
+        joblib.dump(scaler, model_dir / 'scaler.joblib', compress=MODEL_COMPRESSION)
+        joblib.dump(feature_names, model_dir / 'feature_names.joblib', compress=MODEL_COMPRESSION)
 
         self.stdout.write(self.style.SUCCESS(f"\nModels saved to {model_dir}/"))
 
@@ -111,57 +131,71 @@ class Command(BaseCommand):
             away_ppg_l10__isnull=False,
         ).order_by('date')
 
-        X = []
-        y_spread = []
-        y_total = []
-
-        for game in games:
-            features = [
-                # Win percentages
-                float(game.home_win_pct),
-                float(game.away_win_pct),
-                float(game.home_win_pct) - float(game.away_win_pct),  # Win pct diff
-
-                # Scoring (last 10)
-                float(game.home_ppg_l10),
-                float(game.away_ppg_l10),
-                float(game.home_ppg_l10) - float(game.away_ppg_l10),  # PPG diff
-
-                # Defense (last 10)
-                float(game.home_papg_l10) if game.home_papg_l10 else 110.0,
-                float(game.away_papg_l10) if game.away_papg_l10 else 110.0,
-
-                # Net ratings (offense - defense)
-                float(game.home_ppg_l10) - float(game.home_papg_l10 or 110),
-                float(game.away_ppg_l10) - float(game.away_papg_l10 or 110),
-
-                # Streaks
-                game.home_streak,
-                game.away_streak,
-                game.home_streak - game.away_streak,  # Streak diff
-
-                # Rest
-                game.home_rest_days,
-                game.away_rest_days,
-                game.home_rest_days - game.away_rest_days,  # Rest advantage
-
-                # Home/away records
-                game.home_home_wins / max(game.home_home_wins + game.home_home_losses, 1),
-                game.away_away_wins / max(game.away_away_wins + game.away_away_losses, 1),
-
-                # Head-to-head
-                game.h2h_home_wins / max(game.h2h_home_wins + game.h2h_away_wins, 1) if (game.h2h_home_wins + game.h2h_away_wins) > 0 else 0.5,
-
-                # Combined scoring potential (for total prediction)
-                (float(game.home_ppg_l10) + float(game.away_ppg_l10)) / 2,
-
-                # Combined defensive strength (lower = better)
-                (float(game.home_papg_l10 or 110) + float(game.away_papg_l10 or 110)) / 2,
-            ]
-
-            X.append(features)
-            y_spread.append(game.home_score - game.away_score)  # Actual spread
-            y_total.append(game.home_score + game.away_score)   # Actual total
+        # Stream plain column values (not model instances) straight into a
+        # preallocated array, so no full list of rows is built; NULLs become NaN
+        raw = np.empty((games.count(), len(DATA_COLUMNS)), dtype=np.float64)
+        filled = 0
+        for filled, row in enumerate(games.values_list(*DATA_COLUMNS).iterator(chunk_size=5000), 1):
+            raw[filled - 1] = row
+        raw = raw[:filled]
+        col = dict(zip(DATA_COLUMNS, raw.T))
+
+        home_win_pct = col['home_win_pct']
+        away_win_pct = col['away_win_pct']
+        home_ppg = col['home_ppg_l10']
+        away_ppg = col['away_ppg_l10']
+        # Missing (or zero) points allowed falls back to a league-average 110
+        home_papg = np.where(np.isnan(col['home_papg_l10']) | (col['home_papg_l10'] == 0), 110.0, col['home_papg_l10'])
+        away_papg = np.where(np.isnan(col['away_papg_l10']) | (col['away_papg_l10'] == 0), 110.0, col['away_papg_l10'])
+        h2h_games = col['h2h_home_wins'] + col['h2h_away_wins']
+
+        X = np.column_stack([
+            # Win percentages
+            home_win_pct,
+            away_win_pct,
+            home_win_pct - away_win_pct,  # Win pct diff
+
+            # Scoring (last 10)
+            home_ppg,
+            away_ppg,
+            home_ppg - away_ppg,  # PPG diff
+
+            # Defense (last 10)
+            home_papg,
+            away_papg,
+
+            # Net ratings (offense - defense)
+            home_ppg - home_papg,
+            away_ppg - away_papg,
+
+            # Streaks
+            col['home_streak'],
+            col['away_streak'],
+            col['home_streak'] - col['away_streak'],  # Streak diff
+
+            # Rest
+            col['home_rest_days'],
+            col['away_rest_days'],
+            col['home_rest_days'] - col['away_rest_days'],  # Rest advantage
+
+            # Home/away records
+            col['home_home_wins'] / np.maximum(col['home_home_wins'] + col['home_home_losses'], 1),
+            col['away_away_wins'] / np.maximum(col['away_away_wins'] + col['away_away_losses'], 1),
+
+            # Head-to-head
+            np.where(h2h_games > 0, col['h2h_home_wins'] / np.maximum(h2h_games, 1), 0.5),
+
+            # Combined scoring potential (for total prediction)
+            (home_ppg + away_ppg) / 2,
+
+            # Combined defensive strength (lower = better)
+            (home_papg + away_papg) / 2,
+        ])
+
+        home_score = col['home_score'].astype(np.int64)
+        away_score = col['away_score'].astype(np.int64)
+        y_spread = home_score - away_score  # Actual spread
+        y_total = home_score + away_score   # Actual total
 
         feature_names = [
             'home_win_pct', 'away_win_pct', 'win_pct_diff',
@@ -175,17 +209,22 @@ class Command(BaseCommand):
             'avg_ppg', 'avg_papg',
         ]
 
-        return np.array(X), np.array(y_spread), np.array(y_total), feature_names
+        return X, y_spread, y_total, feature_names
 
     def _train_model(self, model_type, X_train, y_train):
         """Train a model of the specified type."""
         if model_type == 'ridge':
             model = Ridge(alpha=1.0)
         else:  # gbr
-            model = GradientBoostingRegressor(
-                n_estimators=100,
+            # Histogram-based boosting bins features before searching splits,
+            # which fits much faster than the exact GradientBoostingRegressor.
+            # Early stopping stays off so every fit runs all 100 iterations on
+            # the full training set, as the exact model did
+            model = HistGradientBoostingRegressor(
+                max_iter=100,
                 max_depth=4,
                 learning_rate=0.1,
+                early_stopping=False,
                 random_state=42
             )
 
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-15 22:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_add_evaluated_to_userpick'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['home_team', 'away_team', 'date'], name='core_game_home_te_c639be_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F, Q
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -194,6 +195,19 @@ class Player(models.Model):
         return f"{self.name} ({self.team.abbreviation})"
 
 
+# Database counterparts of Game.prediction_correct and UserPick.is_correct,
+# for counting in queries. Like Game.winner, the home team wins with the
+# higher score and the away team otherwise.
+PREDICTION_CORRECT = Q(status='final') & (
+    Q(prediction_home_win_prob__gte=50, home_score__gt=F('away_score')) |
+    Q(prediction_home_win_prob__lt=50, home_score__lte=F('away_score'))
+)
+CORRECT_PICK = Q(game__status='final') & (
+    Q(picked_team=F('game__home_team'), game__home_score__gt=F('game__away_score')) |
+    Q(picked_team=F('game__away_team'), game__home_score__lte=F('game__away_score'))
+)
+
+
 class Game(models.Model):
     """NBA Game model with prediction data"""
     STATUS_CHOICES = [
@@ -273,6 +287,10 @@ class Game(models.Model):
     class Meta:
         ordering = ['-date', 'time']
         unique_together = ['date', 'home_team', 'away_team']
+        indexes = [
+            # Matchup lookups with a date range (e.g. betting line matching)
+            models.Index(fields=['home_team', 'away_team', 'date']),
+        ]
 
     def __str__(self):
         return f"{self.away_team.abbreviation} @ {self.home_team.abbreviation} - {self.date}"
@@ -511,6 +529,10 @@ class HistoricalGame(models.Model):
     """
     Historical NBA game data for ML model training.
     Stores game results and pre-game features calculated from rolling history.
+
+    Rows are written with bulk_create/bulk_update (see
+    core.services.historical_features), which skip save() and the
+    pre_save/post_save signals, so don't hang per-row logic on either.
     """
     # Game identification
     api_game_id = models.IntegerField(unique=True, help_text="Game ID from balldontlie API")
@@ -0,0 +1,56 @@
+"""
+Bulk database helpers
+
+Shared upsert logic for commands that load data in batches.
+"""
+from django.db import connection, transaction
+
+
+def bulk_upsert(model, objs, unique_fields, update_fields, batch_size=1000):
+    """
+    Insert objs in batches, updating update_fields on rows that already exist.
+
+    MySQL resolves conflicts against any unique key and rejects an explicit
+    conflict target, so unique_fields is only passed where it is supported.
+    Note that on MySQL the returned objects do not have primary keys set.
+    Like bulk_create itself, this bypasses save() and sends no signals.
+    """
+    if not connection.features.supports_update_conflicts_with_target:
+        unique_fields = None
+    return model.objects.bulk_create(
+        objs,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=update_fields,
+    )
+
+
+def bulk_sync(model, existing, rows, update_fields, batch_size=1000):
+    """
+    Create or update rows matched in memory by a natural key.
+
+    For loads where bulk_upsert does not fit, e.g. models without a unique
+    constraint on the key. existing maps key -> saved instance; rows yields
+    (key, field values) pairs, and a repeated key keeps its last values.
+    Matched instances get the values set and are saved with one bulk_update
+    of update_fields, the rest are inserted with bulk_create, all in one
+    transaction. Returns the (created, updated) instance lists; as with
+    bulk_upsert, created instances have no primary key on MySQL.
+    """
+    objs = {}
+    for key, values in rows:
+        obj = objs.get(key) or existing.get(key)
+        if obj is None:
+            obj = model(**values)
+        else:
+            for field, value in values.items():
+                setattr(obj, field, value)
+        objs[key] = obj
+    created = [obj for obj in objs.values() if obj.pk is None]
+    updated = [obj for obj in objs.values() if obj.pk is not None]
+
+    with transaction.atomic(savepoint=False):
+        model.objects.bulk_create(created, batch_size=batch_size)
+        model.objects.bulk_update(updated, update_fields, batch_size=batch_size)
+    return created, updated
@@ -0,0 +1,250 @@
+"""
+Historical Game Features
+
+Calculates the pre-game features stored on HistoricalGame for ML training:
+win %, last-10 scoring averages, streaks, rest days, season head-to-head
+and home/away records, each using only games played before that game.
+"""
+import numpy as np
+from django.db import transaction
+
+# Raw game columns refreshed when a game is loaded again
+GAME_FIELDS = ['date', 'season', 'home_team_abbr', 'away_team_abbr', 'home_score', 'away_score']
+
+# Pre-game feature columns written by calculate_features
+FEATURE_FIELDS = [
+    'home_win_pct', 'away_win_pct',
+    'home_ppg_l10', 'away_ppg_l10', 'home_papg_l10', 'away_papg_l10',
+    'home_streak', 'away_streak',
+    'home_rest_days', 'away_rest_days',
+    'h2h_home_wins', 'h2h_away_wins',
+    'home_home_wins', 'home_home_losses', 'away_away_wins', 'away_away_losses',
+]
+
+# Number of games written per bulk_update
+UPDATE_BATCH_SIZE = 5000
+
+# Games included in rolling averages
+ROLLING_WINDOW = 10
+
+# Decimal places for the DecimalField features; all other features are integers
+DECIMAL_FEATURES = {
+    'home_win_pct': 3, 'away_win_pct': 3,
+    'home_ppg_l10': 1, 'away_ppg_l10': 1, 'home_papg_l10': 1, 'away_papg_l10': 1,
+}
+
+
+# Columns of the feature array filled by head_to_head_wins
+H2H_HOME_COL = FEATURE_FIELDS.index('h2h_home_wins')
+H2H_AWAY_COL = FEATURE_FIELDS.index('h2h_away_wins')
+
+
+def head_to_head_wins(home_ids, away_ids, season_ids, home_won, num_teams):
+    """
+    Count each game's prior same-season head-to-head wins for both teams.
+
+    Every game is a win event keyed by (season, winner, loser). Sorting the
+    events by key and game index lets one searchsorted per side count the
+    earlier events matching (season, home, away) and (season, away, home),
+    replacing per-game dictionary updates. Returns (home_wins, away_wins).
+    """
+    num_games = home_ids.shape[0]
+    pair_base = season_ids.astype(np.int64) * num_teams
+    winners = np.where(home_won, home_ids, away_ids)
+    losers = np.where(home_won, away_ids, home_ids)
+
+    # Events ordered by key, then by game index within a key
+    order = np.arange(num_games, dtype=np.int64)
+    events = np.sort(((pair_base + winners) * num_teams + losers) * num_games + order)
+
+    def prior_wins(team_ids, opponent_ids):
+        start = ((pair_base + team_ids) * num_teams + opponent_ids) * num_games
+        return np.searchsorted(events, start + order) - np.searchsorted(events, start)
+
+    return prior_wins(home_ids, away_ids), prior_wins(away_ids, home_ids)
+
+
+def compute_features_kernel(home_ids, away_ids, home_scores, away_scores, date_ords, num_teams):
+    """
+    Compute pre-game features for games sorted by date.
+
+    Takes parallel per-game arrays (team indices, scores and date ordinals)
+    and returns an (n_games, len(FEATURE_FIELDS)) float array in
+    FEATURE_FIELDS order. The head-to-head columns are left for
+    head_to_head_wins to fill. Win % and rolling averages are NaN when a
+    team has no prior games; rest days default to 2 for a team's first game.
+    Only touches flat NumPy arrays and scalars so it can be JIT-compiled.
+    """
+    num_games = home_ids.shape[0]
+    out = np.empty((num_games, len(FEATURE_FIELDS)), dtype=np.float64)
+
+    # Team stats as of the current game, one array per stat indexed by team
+    wins = np.zeros(num_teams, dtype=np.int32)
+    losses = np.zeros(num_teams, dtype=np.int32)
+    home_wins = np.zeros(num_teams, dtype=np.int32)
+    home_losses = np.zeros(num_teams, dtype=np.int32)
+    away_wins = np.zeros(num_teams, dtype=np.int32)
+    away_losses = np.zeros(num_teams, dtype=np.int32)
+    streak = np.zeros(num_teams, dtype=np.int32)
+    last_game_ord = np.full(num_teams, -1, dtype=np.int32)  # -1 = no games yet
+
+    # Ring buffers of points scored/allowed over each team's last 10 games,
+    # written at slot (games played % 10), with running sums of their contents
+    recent_scored = np.zeros((num_teams, ROLLING_WINDOW), dtype=np.int32)
+    recent_allowed = np.zeros((num_teams, ROLLING_WINDOW), dtype=np.int32)
+    scored_sum = np.zeros(num_teams, dtype=np.int32)
+    allowed_sum = np.zeros(num_teams, dtype=np.int32)
+
+    for g in range(num_games):
+        home = home_ids[g]
+        away = away_ids[g]
+        game_ord = date_ords[g]
+
+        # Pre-game features (BEFORE updating with this game's result)
+        home_games = wins[home] + losses[home]
+        away_games = wins[away] + losses[away]
+        out[g, 0] = wins[home] / home_games if home_games > 0 else np.nan
+        out[g, 1] = wins[away] / away_games if away_games > 0 else np.nan
+
+        home_recent = min(home_games, ROLLING_WINDOW)
+        away_recent = min(away_games, ROLLING_WINDOW)
+        if home_recent > 0:
+            out[g, 2] = scored_sum[home] / home_recent
+            out[g, 4] = allowed_sum[home] / home_recent
+        else:
+            out[g, 2] = np.nan
+            out[g, 4] = np.nan
+        if away_recent > 0:
+            out[g, 3] = scored_sum[away] / away_recent
+            out[g, 5] = allowed_sum[away] / away_recent
+        else:
+            out[g, 3] = np.nan
+            out[g, 5] = np.nan
+
+        out[g, 6] = streak[home]
+        out[g, 7] = streak[away]
+        out[g, 8] = min(game_ord - last_game_ord[home], 7) if last_game_ord[home] >= 0 else 2
+        out[g, 9] = min(game_ord - last_game_ord[away], 7) if last_game_ord[away] >= 0 else 2
+        out[g, 12] = home_wins[home]
+        out[g, 13] = home_losses[home]
+        out[g, 14] = away_wins[away]
+        out[g, 15] = away_losses[away]
+
+        # NOW update stats with this game's result
+        if home_scores[g] > away_scores[g]:
+            wins[home] += 1
+            home_wins[home] += 1
+            losses[away] += 1
+            away_losses[away] += 1
+            streak[home] = streak[home] + 1 if streak[home] >= 0 else 1
+            streak[away] = streak[away] - 1 if streak[away] <= 0 else -1
+        else:
+            wins[away] += 1
+            away_wins[away] += 1
+            losses[home] += 1
+            home_losses[home] += 1
+            streak[away] = streak[away] + 1 if streak[away] >= 0 else 1
+            streak[home] = streak[home] - 1 if streak[home] <= 0 else -1
+
+        # Update recent games, overwriting the oldest slot once the buffer is
+        # full (empty slots are zero, so the sums need no special case)
+        home_slot = home_games % ROLLING_WINDOW
+        away_slot = away_games % ROLLING_WINDOW
+        scored_sum[home] += home_scores[g] - recent_scored[home, home_slot]
+        allowed_sum[home] += away_scores[g] - recent_allowed[home, home_slot]
+        scored_sum[away] += away_scores[g] - recent_scored[away, away_slot]
+        allowed_sum[away] += home_scores[g] - recent_allowed[away, away_slot]
+        recent_scored[home, home_slot] = home_scores[g]
+        recent_allowed[home, home_slot] = away_scores[g]
+        recent_scored[away, away_slot] = away_scores[g]
+        recent_allowed[away, away_slot] = home_scores[g]
+
+        last_game_ord[home] = game_ord
+        last_game_ord[away] = game_ord
+
+    return out
+
+
+def calculate_features(log=print):
+    """
+    Calculate pre-game features for all historical games.
+
+    Progress messages are passed to log (e.g. a command's stdout.write).
+    Features are saved with bulk_update, so no save signals are sent.
+    Returns the number of games processed, i.e. all games in the table.
+    """
+    from core.models import HistoricalGame
+
+    # Stream just the columns the features depend on, unordered; the games
+    # are sorted by date below rather than by the database
+    pks, homes, aways, seasons, home_scores, away_scores, date_ords = [], [], [], [], [], [], []
+    rows = HistoricalGame.objects.order_by().values_list(
+        'pk', 'home_team_abbr', 'away_team_abbr', 'season', 'home_score', 'away_score', 'date'
+    )
+    for pk, home, away, season, home_score, away_score, game_date in rows.iterator(chunk_size=2000):
+        pks.append(pk)
+        homes.append(home)
+        aways.append(away)
+        seasons.append(season)
+        home_scores.append(home_score)
+        away_scores.append(away_score)
+        date_ords.append(game_date.toordinal())
+
+    total = len(pks)
+
+    # Map team abbreviations and seasons to array indices; the home and away
+    # columns are coded together so both use the same team numbering
+    team_abbrs, team_ids = np.unique(np.array(homes + aways), return_inverse=True)
+    team_ids = team_ids.astype(np.int32)
+    season_ids = np.unique(np.array(seasons, dtype=np.int32), return_inverse=True)[1]
+
+    # Put every column in date order with one stable argsort
+    date_ords = np.array(date_ords, dtype=np.int32)
+    order = np.argsort(date_ords, kind='stable')
+    pks = np.array(pks, dtype=np.int64)[order]
+    date_ords = date_ords[order]
+    season_ids = season_ids[order]
+    home_ids = team_ids[:total][order]
+    away_ids = team_ids[total:][order]
+    home_scores = np.array(home_scores, dtype=np.int32)[order]
+    away_scores = np.array(away_scores, dtype=np.int32)[order]
+
+    features = compute_features_kernel(
+        home_ids, away_ids, home_scores, away_scores, date_ords, len(team_abbrs),
+    )
+    features[:, H2H_HOME_COL], features[:, H2H_AWAY_COL] = head_to_head_wins(
+        home_ids, away_ids, season_ids, home_scores > away_scores, len(team_abbrs),
+    )
+
+    processed = 0
+    pending = []
+
+    # Commit all feature batches together
+    with transaction.atomic():
+        for pk, row in zip(pks.tolist(), features.tolist()):
+            game = HistoricalGame(pk=pk)
+            for field, value in zip(FEATURE_FIELDS, row):
+                places = DECIMAL_FEATURES.get(field)
+                if places is None:
+                    setattr(game, field, int(value))
+                elif value != value:  # NaN - no prior games
+                    setattr(game, field, None)
+                else:
+                    # DecimalField converts the float once when the query is built
+                    setattr(game, field, round(value, places))
+
+            pending.append(game)
+            if len(pending) >= UPDATE_BATCH_SIZE:
+                HistoricalGame.objects.bulk_update(pending, FEATURE_FIELDS)
+                pending.clear()
+
+            processed += 1
+            if processed % 500 == 0:
+                log(f"  Processed {processed}/{total} games...")
+
+        if pending:
+            HistoricalGame.objects.bulk_update(pending, FEATURE_FIELDS)
+
+    log(f"  Processed {processed}/{total} games")
+
+    return processed
@@ -0,0 +1,27 @@
+"""
+HTTP helpers
+
+Shared requests session setup for the external API clients.
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def create_session(pool_maxsize=8):
+    """
+    Create a requests session that keeps connections alive between calls
+    and retries transient failures (rate limiting, 5xx) with backoff.
+    """
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['GET'],
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
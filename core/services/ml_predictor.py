@@ -76,19 +76,46 @@ class MLPredictor:
         """
         if not self.models_loaded:
             return None
+        return self.predict_many([(home_team, away_team, game)])[0]
 
-        # Prepare features
-        features = self._prepare_features(home_team, away_team, game)
-        if features is None:
-            return None
-
-        # Scale features
-        features_scaled = self.scaler.transform([features])
+    def predict_many(self, matchups):
+        """
+        Predict spread and total for several games with one model call.
 
-        # Predict
-        spread = float(self.spread_model.predict(features_scaled)[0])
-        total = float(self.total_model.predict(features_scaled)[0])
+        Args:
+            matchups: List of (home_team, away_team, game) tuples
 
+        Returns:
+            list: One predict() result per matchup, None where features
+                  could not be prepared or models are not available
+        """
+        if not self.models_loaded:
+            return [None] * len(matchups)
+
+        # Prepare features, keeping track of which matchups have them
+        rows = []
+        indices = []
+        for i, (home_team, away_team, game) in enumerate(matchups):
+            features = self._prepare_features(home_team, away_team, game)
+            if features is not None:
+                rows.append(features)
+                indices.append(i)
+
+        results = [None] * len(matchups)
+        if not rows:
+            return results
+
+        # Scale and predict all games at once
+        features_scaled = self.scaler.transform(rows)
+        spreads = self.spread_model.predict(features_scaled)
+        totals = self.total_model.predict(features_scaled)
+
+        for i, spread, total in zip(indices, spreads.tolist(), totals.tolist()):
+            results[i] = self._scores_from_prediction(spread, total)
+        return results
+
+    def _scores_from_prediction(self, spread, total):
+        """Turn a raw spread and total into (spread, total, home_score, away_score)."""
         # Cap spread at realistic limits
         spread = max(-16, min(16, spread))
 
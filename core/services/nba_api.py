@@ -5,8 +5,29 @@ Fetches data from balldontlie.io API and calculates advanced statistics.
 import requests
 from datetime import datetime, timedelta, date
 from decimal import Decimal
-from .prediction_model import predict_game, NBAPredictor
-
+from django.db import transaction
+from .bulk import bulk_sync, bulk_upsert
+from .http import create_session
+from .prediction_model import predict_games, NBAPredictor
+
+
+# Team fields refreshed from the API team list
+API_TEAM_FIELDS = ['name', 'city', 'conference']
+
+# Team fields changed by update_team_after_game
+TEAM_RESULT_FIELDS = [
+    'wins', 'losses', 'elo_rating', 'last_game_date',
+    'avg_points_scored', 'avg_points_allowed',
+]
+
+# Game fields written by sync_games_from_api; any others keep their saved values.
+# Games that could not be predicted only get GAME_RESULT_FIELDS, keeping any
+# prediction already stored.
+GAME_RESULT_FIELDS = ['home_score', 'away_score', 'status']
+SYNCED_GAME_FIELDS = GAME_RESULT_FIELDS + [
+    'prediction_home_win_prob', 'prediction_confidence', 'predicted_spread',
+    'predicted_home_score', 'predicted_away_score',
+]
 
 class NBAApiService:
     """Service to fetch NBA data from balldontlie.io API"""
@@ -18,12 +39,14 @@ class NBAApiService:
         self.headers = {}
         if api_key:
             self.headers['Authorization'] = api_key
+        # One session per service so paginated calls reuse the connection
+        self.session = create_session()
 
     def _make_request(self, endpoint, params=None):
         """Make a GET request to the API"""
         url = f"{self.BASE_URL}/{endpoint}"
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=10)
+            response = self.session.get(url, headers=self.headers, params=params, timeout=10)
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
@@ -66,6 +89,15 @@ class NBAApiService:
             return data.get('data', []), data.get('meta', {}).get('next_cursor')
         return [], None
 
+    def iter_games(self, start_date=None, end_date=None, team_ids=None, per_page=100):
+        """Yield every game in the date range, following the cursor one page at a time"""
+        cursor = None
+        while True:
+            games, cursor = self.get_games(start_date, end_date, team_ids, per_page, cursor)
+            yield from games
+            if not cursor:
+                break
+
     def get_stats(self, game_ids=None, player_ids=None, per_page=100, cursor=None):
         """Fetch player box score stats"""
         params = {'per_page': per_page}
@@ -119,7 +151,7 @@ def sync_teams_from_api(api_key=None):
         'WAS': ('Wizards', 'Washington'),  # API returns "Capitols"
     }
 
-    created_count = 0
+    rows = {}
     for api_team in api_teams:
         conference = conference_map.get(api_team.get('conference'), 'EAST')
         abbr = api_team.get('abbreviation')
@@ -131,18 +163,11 @@ def sync_teams_from_api(api_key=None):
             name = api_team.get('name')
             city = api_team.get('city')
 
-        team, created = Team.objects.update_or_create(
-            abbreviation=abbr,
-            defaults={
-                'name': name,
-                'city': city,
-                'conference': conference,
-            }
-        )
-        if created:
-            created_count += 1
+        rows[abbr] = {'abbreviation': abbr, 'name': name, 'city': city, 'conference': conference}
 
-    return created_count
+    created, _ = bulk_sync(Team, Team.objects.in_bulk(field_name='abbreviation'),
+                           rows.items(), API_TEAM_FIELDS)
+    return len(created)
 
 
 def sync_games_from_api(api_key=None, days_ahead=7, days_back=30):
@@ -154,22 +179,45 @@ def sync_games_from_api(api_key=None, days_ahead=7, days_back=30):
     start_date = today - timedelta(days=days_back)
     end_date = today + timedelta(days=days_ahead)
 
-    # Fetch all games in date range
-    all_games = []
-    cursor = None
-    while True:
-        games, cursor = service.get_games(start_date, end_date, cursor=cursor)
-        all_games.extend(games)
-        if not cursor:
-            break
+    # Load every team once; games share these instances, so results applied
+    # by update_team_after_game are seen by later predictions in this sync
+    teams = Team.objects.in_bulk(field_name='abbreviation')
+    updated_teams = {}
+
+    # Status of every stored game in the window, keyed like Game's unique_together
+    game_statuses = {
+        (game_date, home_id, away_id): status
+        for game_date, home_id, away_id, status in Game.objects.filter(
+            date__range=(start_date, end_date)
+        ).values_list('date', 'home_team_id', 'away_team_id', 'status')
+    }
+    games = {}
+    newly_final = []
+
+    # Games waiting for a prediction. They are predicted together, and always
+    # before a newly final game changes team stats, so each prediction sees
+    # the same ratings it would have seen if made one game at a time. Keyed
+    # like games, so a matchup repeated across pages is only predicted once.
+    pending = {}
+
+    def predict_pending():
+        predictions = predict_games([(game.home_team, game.away_team, game.date, None) for game in pending.values()])
+        for game, prediction in zip(pending.values(), predictions):
+            (game.prediction_home_win_prob, game.prediction_confidence, game.predicted_spread,
+             game.predicted_home_score, game.predicted_away_score) = prediction
+        pending.clear()
 
     created_count = 0
     updated_count = 0
 
-    for api_game in all_games:
+    # Process games page by page as they arrive rather than holding every raw
+    # API response in memory first
+    for api_game in service.iter_games(start_date, end_date):
         try:
-            home_team = Team.objects.get(abbreviation=api_game['home_team']['abbreviation'])
-            away_team = Team.objects.get(abbreviation=api_game['visitor_team']['abbreviation'])
+            home_team = teams.get(api_game['home_team']['abbreviation'])
+            away_team = teams.get(api_game['visitor_team']['abbreviation'])
+            if home_team is None or away_team is None:
+                continue
 
             game_date = datetime.strptime(api_game['date'][:10], '%Y-%m-%d').date()
 
@@ -185,55 +233,89 @@ def sync_games_from_api(api_key=None, days_ahead=7, days_back=30):
             elif api_game.get('period', 0) > 0:
                 status = 'in_progress'
 
-            # Generate prediction using ML model
-            home_win_prob, confidence, spread, pred_home_score, pred_away_score = predict_game(home_team, away_team, game_date)
-
             # Check if game already exists and its current status
-            existing_game = Game.objects.filter(
-                date=game_date,
-                home_team=home_team,
-                away_team=away_team
-            ).first()
-            was_already_final = existing_game and existing_game.status == 'final'
+            key = (game_date, home_team.pk, away_team.pk)
+            previous_status = game_statuses.get(key)
+            was_already_final = previous_status == 'final'
 
-            game, created = Game.objects.update_or_create(
+            game = Game(
                 date=game_date,
                 home_team=home_team,
                 away_team=away_team,
-                defaults={
-                    'home_score': home_score,
-                    'away_score': away_score,
-                    'status': status,
-                    'prediction_home_win_prob': home_win_prob,
-                    'prediction_confidence': confidence,
-                    'predicted_spread': spread,
-                    'predicted_home_score': pred_home_score,
-                    'predicted_away_score': pred_away_score,
-                }
+                home_score=home_score,
+                away_score=away_score,
+                status=status,
             )
+            pending[key] = game
 
-            if created:
+            # Update team records and Elo only when game BECOMES final (not already final).
+            # Both happen before the game is recorded, so if either fails the game
+            # is not saved as final and the next sync retries it
+            if status == 'final' and not was_already_final and home_score is not None and away_score is not None:
+                try:
+                    predict_pending()
+                except Exception:
+                    # Keep any earlier copy of this game queued, drop this one
+                    if key in games:
+                        pending[key] = games[key]
+                    else:
+                        del pending[key]
+                    raise
+                update_team_after_game(home_team, away_team, home_score, away_score, game_date, save=False)
+                updated_teams[home_team.pk] = home_team
+                updated_teams[away_team.pk] = away_team
+                newly_final.append(key)
+
+            game_statuses[key] = status
+            games[key] = game
+
+            if previous_status is None:
                 created_count += 1
             else:
                 updated_count += 1
 
-            # Update team records and Elo only when game BECOMES final (not already final)
-            if status == 'final' and not was_already_final and home_score is not None and away_score is not None:
-                update_team_after_game(home_team, away_team, home_score, away_score, game_date)
-                # Evaluate user picks for this game
-                evaluate_user_picks_for_game(game)
-
-        except Team.DoesNotExist:
-            continue
         except Exception as e:
             print(f"Error syncing game: {e}")
             continue
 
+    # A failed prediction leaves those games unpredicted but still synced
+    unpredicted = {}
+    try:
+        predict_pending()
+    except Exception as e:
+        print(f"Error predicting games: {e}")
+        unpredicted = dict(pending)
+    predicted = [game for key, game in games.items() if key not in unpredicted]
+
+    # Commit games, team results and pick evaluations together, so a failure
+    # cannot leave a game final without its team updates and picks applied
+    with transaction.atomic():
+        # Upsert all games, then save every team touched by a newly final game
+        bulk_upsert(Game, predicted, ['date', 'home_team', 'away_team'], SYNCED_GAME_FIELDS)
+        bulk_upsert(Game, list(unpredicted.values()), ['date', 'home_team', 'away_team'], GAME_RESULT_FIELDS)
+        Team.objects.bulk_update(updated_teams.values(), TEAM_RESULT_FIELDS)
+
+        # Evaluate user picks for newly final games against the saved rows
+        if newly_final:
+            saved_games = {
+                (game.date, game.home_team_id, game.away_team_id): game
+                for game in Game.objects.filter(
+                    date__in={key[0] for key in newly_final}, status='final'
+                ).select_related('home_team', 'away_team')
+            }
+            for key in newly_final:
+                game = saved_games.get(key)
+                if game is not None:
+                    evaluate_user_picks_for_game(game)
+
     return created_count, updated_count
 
 
-def update_team_after_game(home_team, away_team, home_score, away_score, game_date):
-    """Update team statistics after a completed game"""
+def update_team_after_game(home_team, away_team, home_score, away_score, game_date, save=True):
+    """
+    Update team statistics after a completed game.
+    Pass save=False to batch the writes; the changed fields are TEAM_RESULT_FIELDS.
+    """
     predictor = NBAPredictor()
 
     # Determine winner and margin
@@ -276,8 +358,9 @@ def update_team_after_game(home_team, away_team, home_score, away_score, game_da
             (float(away_team.avg_points_allowed) * (games_played - 1) + home_score) / games_played, 1
         )))
 
-    home_team.save()
-    away_team.save()
+    if save:
+        home_team.save(update_fields=TEAM_RESULT_FIELDS)
+        away_team.save(update_fields=TEAM_RESULT_FIELDS)
 
 
 def calculate_team_advanced_stats(team, games, box_scores):
@@ -402,20 +485,22 @@ def evaluate_user_picks_for_game(game):
     if game.status != 'final' or game.winner is None:
         return 0
 
+    winner_id = game.winner.pk
     updated_count = 0
-    # Only get picks that haven't been evaluated yet
-    picks = UserPick.objects.filter(game=game, evaluated=False).select_related('user')
+    # Only get picks that haven't been evaluated yet (ids are all we need)
+    picks = list(
+        UserPick.objects.filter(game=game, evaluated=False).values_list('id', 'user_id', 'picked_team_id')
+    )
 
-    for pick in picks:
-        if pick.picked_team == game.winner:
+    for _, user_id, picked_team_id in picks:
+        if picked_team_id == winner_id:
             # User got it right - increment their correct_picks
-            profile, _ = UserProfile.objects.get_or_create(user=pick.user)
+            profile, _ = UserProfile.objects.get_or_create(user_id=user_id)
             profile.correct_picks += 1
-            profile.save()
+            profile.save(update_fields=['correct_picks'])
             updated_count += 1
 
-        # Mark pick as evaluated regardless of outcome
-        pick.evaluated = True
-        pick.save()
+    # Mark picks as evaluated regardless of outcome
+    UserPick.objects.filter(pk__in=[pick_id for pick_id, _, _ in picks]).update(evaluated=True)
 
     return updated_count
@@ -533,6 +533,26 @@ def predict_game(home_team, away_team, game_date=None, game=None, use_ml=True):
     Returns:
         tuple: (home_win_prob, confidence, spread, home_score, away_score)
     """
+    return predict_games([(home_team, away_team, game_date, game)], use_ml=use_ml)[0]
+
+
+def predict_games(games, use_ml=True):
+    """
+    Batch version of predict_game.
+
+    Runs the ML models once over every game, then uses a single heuristic
+    predictor for any game the ML model could not predict.
+
+    Args:
+        games: List of (home_team, away_team, game_date, game) tuples
+        use_ml: Whether to try ML model first (default True)
+
+    Returns:
+        list: One (home_win_prob, confidence, spread, home_score, away_score)
+              tuple per game, in order
+    """
+    predictions = [None] * len(games)
+
     # Try ML prediction first
     if use_ml:
         try:
@@ -540,19 +560,26 @@ def predict_game(home_team, away_team, game_date=None, game=None, use_ml=True):
             ml_predictor = get_ml_predictor()
 
             if ml_predictor.models_loaded:
-                result = ml_predictor.predict(home_team, away_team, game)
-                if result:
-                    spread, total, home_score, away_score = result
-
-                    # Calculate win probability and confidence
-                    home_win_prob = ml_predictor.calculate_win_probability(float(spread))
-                    confidence = ml_predictor.calculate_confidence(float(spread), home_team, away_team)
-
-                    return (home_win_prob, confidence, spread, home_score, away_score)
+                results = ml_predictor.predict_many(
+                    [(home_team, away_team, game) for home_team, away_team, _, game in games]
+                )
+                for i, result in enumerate(results):
+                    if result:
+                        spread, total, home_score, away_score = result
+                        home_team, away_team = games[i][:2]
+
+                        # Calculate win probability and confidence
+                        home_win_prob = ml_predictor.calculate_win_probability(float(spread))
+                        confidence = ml_predictor.calculate_confidence(float(spread), home_team, away_team)
+
+                        predictions[i] = (home_win_prob, confidence, spread, home_score, away_score)
         except Exception as e:
             # Fall back to heuristic model
             pass
 
     # Fall back to heuristic model
     predictor = NBAPredictor()
-    return predictor.predict_game(home_team, away_team, game_date, game)
+    return [
+        prediction if prediction is not None else predictor.predict_game(home_team, away_team, game_date, game)
+        for prediction, (home_team, away_team, game_date, game) in zip(predictions, games)
+    ]
@@ -12,7 +12,7 @@ import json
 import io
 import base64
 
-from .models import Team, Player, Game, UserPick, UserProfile
+from .models import Team, Player, Game, UserPick, UserProfile, PREDICTION_CORRECT
 from .forms import UserPickForm, ExportForm
 
 
@@ -158,7 +158,7 @@ def game_detail(request, pk):
             picked_team = form.cleaned_data['picked_team']
             if user_pick:
                 user_pick.picked_team = picked_team
-                user_pick.save()
+                user_pick.save(update_fields=['picked_team', 'updated_at'])
             else:
                 UserPick.objects.create(
                     user=request.user,
@@ -168,7 +168,7 @@ def game_detail(request, pk):
                 # Increment user's total picks count
                 profile, _ = UserProfile.objects.get_or_create(user=request.user)
                 profile.total_picks += 1
-                profile.save()
+                profile.save(update_fields=['total_picks'])
             messages.success(request, f"Your pick for {picked_team.name} has been saved!")
             return redirect('core:game_detail', pk=pk)
     else:
@@ -392,13 +392,16 @@ def leaderboard(request):
     upset_games.sort(key=lambda x: x['upset_score'], reverse=True)
     biggest_upsets = upset_games[:5]
 
-    # Model prediction accuracy (straight up)
-    completed_games = Game.objects.filter(
+    # Model prediction accuracy (straight up), counted in the database
+    prediction_counts = Game.objects.filter(
         status='final',
         prediction_home_win_prob__isnull=False
+    ).aggregate(
+        total=Count('id'),
+        correct=Count('id', filter=PREDICTION_CORRECT),
     )
-    total_predictions = completed_games.count()
-    correct_predictions = sum(1 for g in completed_games if g.prediction_correct)
+    total_predictions = prediction_counts['total']
+    correct_predictions = prediction_counts['correct']
     model_accuracy = round(correct_predictions / max(total_predictions, 1) * 100, 1)
 
     # Team search functionality